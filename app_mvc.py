@@ -4,12 +4,17 @@
 商品信息管理系统主应用文件 - MVC架构版本
 """
 
-from flask import Flask, render_template, send_from_directory, redirect, url_for, session, request
+from flask import Flask, render_template, redirect, url_for, session, request
 from controllers.product_controller import product_bp
 from controllers.auth_controller import auth_bp
-from models.product import Product
+from controllers.file_controller import FileController
+from models.migrations import migrate
 from models.user import User
-from models.user_pref import UserPreference
+from services.purge_service import purge_service
+from services.thumbnail_service import thumbnail_service
+from config import Config
+from utils.compression import init_compression
+from utils.static_assets import init_static
 from logging_config import setup_logging
 import os
 
@@ -20,6 +25,12 @@ def create_app():
     app = Flask(__name__)
     # 用于会话管理
     app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key')
+    # 图片由 Apache/lighttpd 发送时只输出 X-Sendfile 头
+    app.config['USE_X_SENDFILE'] = Config.IMAGE_SENDFILE == 'x-sendfile'
+    file_controller = FileController()
+    # 文本响应按 Accept-Encoding 压缩；静态资源发送启动时生成的预压缩文件
+    init_compression(app)
+    init_static(app)
     
     # 注册蓝图
     app.register_blueprint(product_bp, url_prefix='/product')
@@ -54,32 +65,45 @@ def create_app():
     def entry_page():
         return render_template('entry.html')
     
-    @app.route('/uploads/<filename>')
+    @app.route('/uploads/<path:filename>')
     def uploaded_file(filename):
-        """提供原图文件访问"""
-        return send_from_directory('uploads', filename)
+        """提供原图文件访问（带 w 参数时返回合适尺寸的衍生图）"""
+        return file_controller.serve_image(filename)
     
-    @app.route('/uploads/thumb_<filename>')
+    @app.route('/uploads/thumb_<path:filename>')
     def thumbnail_file(filename):
         """提供缩略图文件访问"""
-        return send_from_directory('uploads', f"thumb_{filename}")
+        return file_controller.serve_thumbnail(filename)
     
     return app
 
 app = create_app()
 
-# 应用启动时初始化数据库表
-with app.app_context():
-    try:
-        Product.create_table()
-        User.create_table()
-        UserPreference.create_table()
-        # 确保存在admin账号（用户名: admin, 密码: admin, 姓名: admin）
-        User.ensure_admin(username='admin', password='admin', real_name='admin')
-        logger.info("数据库表初始化完成")
-    except Exception as e:
-        logger.error(f"数据库表初始化失败: {str(e)}")
+
+def initialize_database():
+    """检查并升级数据库版本并确保管理员账号存在；已是最新时仅读取一次 user_version（多进程部署时在 fork 前执行一次）"""
+    with app.app_context():
+        try:
+            schema_version = migrate()
+            # 确保存在admin账号（用户名: admin, 密码: admin, 姓名: admin）；已存在时只做一次查询
+            User.ensure_admin(username='admin', password='admin', real_name='admin')
+            logger.info(f"数据库表初始化完成，schema版本: v{schema_version}")
+        except Exception as e:
+            logger.error(f"数据库表初始化失败: {str(e)}")
+
+
+def start_background_services():
+    """启动本进程的后台线程（多进程部署时在每个 worker fork 之后调用）"""
+    # 后台清理已过保留期的软删除数据
+    if Config.PURGE_ENABLED:
+        purge_service.start()
+    # 缩略图后台线程池，并重新入队上次未完成的任务
+    thumbnail_service.start()
+
+
+initialize_database()
 
 if __name__ == '__main__':
     logger.info("应用启动中...")
+    start_background_services()
     app.run(debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量更新接口基准测试
+
+在临时目录/临时数据库中对 /product/batch_update 分别提交 10/100/1000 条更新，
+并与逐行 execute_update（旧实现的写法）对比耗时。
+
+用法: python benchmarks/bench_batch_update.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+WORK_DIR = tempfile.mkdtemp(prefix='bench_batch_update_')
+os.environ['DATABASE_PATH'] = os.path.join(WORK_DIR, 'bench.db')
+os.chdir(WORK_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+from app_mvc import app  # noqa: E402
+from models.database import db_manager  # noqa: E402
+
+SIZES = (10, 100, 1000)
+
+
+def seed(count):
+    """插入 count 条测试数据，返回ID列表"""
+    rows = [(f'客户{i}', 1.0, i, f'品名{i}', '2024-01-01') for i in range(count)]
+    db_manager.execute_many(
+        'INSERT INTO products (name, price, quantity, product_desc, doc_date) VALUES (?, ?, ?, ?, ?)',
+        rows
+    )
+    return [r['id'] for r in db_manager.execute_query('SELECT id FROM products ORDER BY id DESC LIMIT ?', (count,))]
+
+
+def make_items(ids, round_no):
+    # 两种列集合交替，覆盖分组逻辑
+    items = []
+    for n, pid in enumerate(ids):
+        if n % 2:
+            items.append({'id': pid, 'fields': {'quantity': round_no + n, 'remark': f'r{round_no}'}})
+        else:
+            items.append({'id': pid, 'fields': {'unit_price': 1.5 + round_no, 'freight': 2}})
+    return items
+
+
+def bench_endpoint(client, items):
+    start = time.perf_counter()
+    resp = client.post('/product/batch_update', json={'items': items})
+    elapsed = time.perf_counter() - start
+    data = resp.get_json()['data']
+    assert data['success_count'] == len(items), data
+    return elapsed
+
+
+def bench_per_row(items):
+    """旧写法：每条一次连接与提交"""
+    start = time.perf_counter()
+    for item in items:
+        fields = item['fields']
+        set_parts = [f"{k}=?" for k in fields] + ["update_time=datetime('now','+8 hours')"]
+        db_manager.execute_update(
+            f"UPDATE products SET {', '.join(set_parts)} WHERE id=?",
+            tuple(fields.values()) + (item['id'],)
+        )
+    return time.perf_counter() - start
+
+
+def main():
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['username'] = 'admin'
+    print(f"{'条数':>6} {'逐行(ms)':>12} {'批量接口(ms)':>14} {'加速比':>8}")
+    for size in SIZES:
+        ids = seed(size)
+        per_row = bench_per_row(make_items(ids, 1))
+        batch = bench_endpoint(client, make_items(ids, 2))
+        print(f"{size:>6} {per_row * 1000:>12.1f} {batch * 1000:>14.1f} {per_row / batch:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
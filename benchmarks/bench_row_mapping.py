@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行映射基准测试：字典行 + Product 对象 vs 紧凑记录
+
+对 10 万行 SELECT * 结果分别测量：
+- 构造结果列表的耗时
+- 进一步序列化为 to_dict 的耗时
+- 结果列表常驻内存与构造期间峰值（tracemalloc）
+
+用法: python benchmarks/bench_row_mapping.py [行数]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+WORK_DIR = tempfile.mkdtemp(prefix='bench_row_mapping_')
+os.environ['DATABASE_PATH'] = os.path.join(WORK_DIR, 'bench.db')
+os.chdir(WORK_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+from models.database import db_manager  # noqa: E402
+from models.migrations import migrate  # noqa: E402
+from models.product import Product  # noqa: E402
+
+SQL = 'SELECT * FROM products'
+
+
+def seed(count):
+    rows = [(f'客户{i}', 1.5, i, f'品名规格{i}', '2024-01-01', '件', f'备注{i}') for i in range(count)]
+    db_manager.execute_many(
+        'INSERT INTO products (name, price, quantity, product_desc, doc_date, unit, remark) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        rows
+    )
+
+
+def legacy_rows():
+    """旧路径：逐列构造字典，再构造 Product 对象"""
+    connection = db_manager.get_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(SQL)
+        columns = [d[0] for d in cursor.description]
+        result = []
+        for row in cursor.fetchall():
+            row_dict = {}
+            for i, column in enumerate(columns):
+                row_dict[column] = row[i]
+            result.append(row_dict)
+    finally:
+        connection.close()
+    return [Product(**d) for d in result]
+
+
+def record_rows():
+    return db_manager.execute_query_records(SQL, name='ProductRecord')
+
+
+def measure(label, func):
+    # 计时与内存分两轮测量，避免 tracemalloc 开销干扰耗时
+    start = time.perf_counter()
+    rows = func()
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    for r in rows:
+        r.to_dict()
+    serialize = time.perf_counter() - start
+    del rows
+
+    tracemalloc.start()
+    rows = func()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} 构造 {build * 1000:>8.1f} ms  to_dict {serialize * 1000:>8.1f} ms  "
+          f"常驻 {retained / 1048576:>7.1f} MiB  峰值 {peak / 1048576:>7.1f} MiB")
+    return len(rows)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    migrate()
+    seed(count)
+    print(f"行数: {count}")
+    measure('旧路径', legacy_rows)
+    measure('紧凑记录', record_rows)
+
+
+if __name__ == '__main__':
+    main()
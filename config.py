@@ -5,13 +5,69 @@
 
 import os
 
+def _image_variants(defaults):
+    """按环境变量 IMAGE_VARIANT_SIZES 覆盖衍生图尺寸（格式不变）"""
+    variants = dict(defaults)
+    for item in filter(None, os.getenv('IMAGE_VARIANT_SIZES', '').split(',')):
+        name, _, size = (part.strip() for part in item.partition(':'))
+        if name in variants and size.isdigit():
+            variants[name] = (int(size), variants[name][1])
+    return variants
+
 class Config:
     """基础配置类"""
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
     DATABASE_PATH = os.getenv('DATABASE_PATH', 'products.db')
-    UPLOAD_FOLDER = 'uploads'
+    # 上传根目录，启动时确定为绝对路径（默认为启动目录下的 uploads，与历史写入位置一致）
+    UPLOAD_FOLDER = os.path.abspath(os.getenv('UPLOAD_FOLDER', 'uploads'))
+    # 上传文件索引按目录 mtime 重新校验的最小间隔（秒）；网络存储上可调大
+    UPLOAD_INDEX_TTL = float(os.getenv('UPLOAD_INDEX_TTL', '30'))
+    # 导出结果缓存（每个进程）的总字节上限，嵌入图片的导出文件可能很大
+    EXPORT_CACHE_MAX_BYTES = int(os.getenv('EXPORT_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
     MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5MB
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+    # 软删除数据保留时长（小时），期间可撤销；到期后由后台任务清理
+    PURGE_ENABLED = os.getenv('PURGE_ENABLED', '1') not in ('0', 'false', 'False')
+    PURGE_RETENTION_HOURS = float(os.getenv('PURGE_RETENTION_HOURS', '72'))
+    PURGE_INTERVAL_SECONDS = int(os.getenv('PURGE_INTERVAL_SECONDS', '300'))
+    PURGE_BATCH_SIZE = int(os.getenv('PURGE_BATCH_SIZE', '200'))
+    # 缩略图后台生成：线程数、失败重试次数；未生成时访问是否现场生成（否则返回原图）
+    THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', '2'))
+    THUMBNAIL_MAX_ATTEMPTS = int(os.getenv('THUMBNAIL_MAX_ATTEMPTS', '3'))
+    THUMBNAIL_ON_DEMAND = os.getenv('THUMBNAIL_ON_DEMAND', '0') in ('1', 'true', 'True')
+    # 图片任务认领超时（秒）：超过该时间仍未完成视为处理进程已退出，可被其他进程重新认领
+    THUMBNAIL_TASK_LEASE = int(os.getenv('THUMBNAIL_TASK_LEASE', '300'))
+    # 批量上传图片：单次请求文件数上限、并行处理线程数
+    BATCH_UPLOAD_MAX_FILES = int(os.getenv('BATCH_UPLOAD_MAX_FILES', '50'))
+    BATCH_UPLOAD_WORKERS = int(os.getenv('BATCH_UPLOAD_WORKERS', '4'))
+    # 上传入库时图片最长边上限（像素）与重新编码的 JPEG 质量
+    IMAGE_MAX_EDGE = int(os.getenv('IMAGE_MAX_EDGE', '2048'))
+    IMAGE_INGEST_QUALITY = int(os.getenv('IMAGE_INGEST_QUALITY', '90'))
+    # 图片多尺寸衍生图：名称 -> (最大边长, 编码格式)；尺寸可用 IMAGE_VARIANT_SIZES=thumb:200,preview:800 覆盖
+    # 导出图嵌入 Excel，openpyxl 不支持直接嵌入 WebP（会转存为 PNG），因此用 JPEG
+    IMAGE_VARIANTS = _image_variants({'thumb': (200, 'WEBP'), 'preview': (800, 'WEBP'), 'export': (480, 'JPEG')})
+    IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', '80'))
+    # 图片文件名按内容寻址、不会复用，浏览器可长期缓存
+    IMAGE_CACHE_MAX_AGE = int(os.getenv('IMAGE_CACHE_MAX_AGE', str(365 * 24 * 3600)))
+    # 图片传输交给前置代理：'' 由 Flask 发送；x-accel-redirect（nginx）；x-sendfile（Apache/lighttpd）
+    IMAGE_SENDFILE = os.getenv('IMAGE_SENDFILE', '').lower()
+    # nginx internal location 前缀，需指向 uploads 目录
+    IMAGE_ACCEL_PREFIX = os.getenv('IMAGE_ACCEL_PREFIX', '/_protected_uploads/')
+    # 响应压缩（gzip；安装 Brotli 后同时支持 br）：小于阈值的响应不压缩
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', '1') in ('1', 'true', 'True')
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+    # 启动时为 static 下的文本资源生成 .gz/.br 预压缩文件
+    STATIC_PRECOMPRESS = os.getenv('STATIC_PRECOMPRESS', '1') in ('1', 'true', 'True')
+    # 启动时为 static 下的资源生成带内容哈希的副本（static/dist），页面通过 asset_url 引用并长期缓存
+    STATIC_FINGERPRINT = os.getenv('STATIC_FINGERPRINT', '1') in ('1', 'true', 'True')
+    STATIC_CACHE_MAX_AGE = int(os.getenv('STATIC_CACHE_MAX_AGE', str(365 * 24 * 3600)))
+    # 生产部署（gunicorn）：监听地址、worker 进程数（默认按 CPU 核数）、每个进程的线程数、请求超时（秒）
+    WEB_BIND = os.getenv('WEB_BIND', '0.0.0.0:5001')
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', str(os.cpu_count() or 1)))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', '4'))
+    WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', '120'))
 
 class DevelopmentConfig(Config):
     """开发环境配置"""
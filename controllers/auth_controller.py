@@ -4,8 +4,12 @@
 认证与用户管理控制器
 """
 
+import os
 from flask import Blueprint, request, jsonify, session, render_template, redirect, url_for
 from models.user import User
+from models.query_stats import query_stats
+from models.archive import product_archive
+from datetime import datetime
 from logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -102,3 +106,51 @@ def reset_user_password(user_id):
     return jsonify(result)
 
 
+@auth_bp.route('/api/query_stats', methods=['GET'])
+@admin_required
+def get_query_stats():
+    """SQL耗时统计（当前进程），按累计耗时降序"""
+    limit = request.args.get('limit', 50, type=int)
+    stats = query_stats.snapshot()
+    return jsonify({
+        'success': True,
+        'data': {
+            'pid': os.getpid(),
+            'slow_threshold_ms': query_stats.slow_threshold_ms,
+            'statements': stats[:limit]
+        }
+    })
+
+
+@auth_bp.route('/api/query_stats', methods=['DELETE'])
+@admin_required
+def reset_query_stats():
+    query_stats.reset()
+    return jsonify({'success': True, 'message': '统计已清空'})
+
+
+@auth_bp.route('/api/archive', methods=['GET'])
+@admin_required
+def list_archives():
+    """已归档年份"""
+    years = product_archive.list_years()
+    return jsonify({'success': True, 'data': {'years': years, 'archive_dir': product_archive.archive_dir}})
+
+
+@auth_bp.route('/api/archive', methods=['POST'])
+@admin_required
+def archive_products():
+    """将单据年份早于 before_year 的数据迁入按年归档库（仅限已结束的年份）"""
+    data = request.get_json() or {}
+    try:
+        before_year = int(data.get('before_year'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'before_year 必须是年份'})
+    if before_year > datetime.now().year:
+        return jsonify({'success': False, 'message': '只能归档已结束的年份'})
+    try:
+        moved = product_archive.archive_before(before_year)
+    except Exception as e:
+        logger.error(f'归档失败: {str(e)}')
+        return jsonify({'success': False, 'message': f'归档失败: {str(e)}'})
+    return jsonify({'success': True, 'message': '归档完成', 'data': {str(y): n for y, n in moved.items()}})
@@ -3,35 +3,60 @@
 文件控制器
 """
 
+import mimetypes
 import os
-from flask import send_file
-from utils.file_handler import FileHandler
+from urllib.parse import quote
+
+from flask import send_file, request, Response
+from config import Config
+from services.thumbnail_service import thumbnail_service
+
+# 衍生图尚未生成时返回的原图不可缓存，生成后同一地址会返回不同内容
+NO_CACHE = 'no-cache'
+
 
 class FileController:
-    """文件控制器类"""
-    
+    """文件控制器类：Python 只负责鉴权与选图，传输可交给前置代理"""
+
     def __init__(self):
-        self.file_handler = FileHandler()
-    
+        self.file_handler = thumbnail_service.file_handler
+
     def serve_image(self, filename):
-        """图片访问接口"""
-        try:
-            file_path = self.file_handler.get_image_path(filename)
-            if os.path.exists(file_path):
-                return send_file(file_path)
-            else:
-                return "文件不存在", 404
-        except Exception as e:
-            return f"文件访问失败: {str(e)}", 500
-    
+        """图片访问接口（带 w 参数时返回合适尺寸的衍生图）"""
+        return self._serve(filename)
+
     def serve_thumbnail(self, filename):
         """缩略图访问接口"""
+        return self._serve(filename, thumbnail=True)
+
+    def _serve(self, filename, thumbnail=False):
+        """按 Accept 与请求宽度 w 选择最小可用的衍生图返回"""
         try:
-            thumb_path = self.file_handler.get_thumb_path(filename)
-            if os.path.exists(thumb_path):
-                return send_file(thumb_path)
+            width = request.args.get('w', type=int)
+            accept_webp = any(value == 'image/webp' for value, _ in request.accept_mimetypes)
+            path, final = thumbnail_service.image_path(
+                filename, width=width, accept_webp=accept_webp, thumbnail=thumbnail
+            )
+            if path is None:
+                return "文件不存在", 404
+            response = self._send(path)
+            if final:
+                # 文件名唯一，内容不会变化
+                response.headers['Cache-Control'] = f'private, max-age={Config.IMAGE_CACHE_MAX_AGE}, immutable'
             else:
-                # 如果缩略图不存在，返回原图
-                return self.serve_image(filename)
+                response.headers['Cache-Control'] = NO_CACHE
+            if width or thumbnail:
+                response.vary.add('Accept')
+            return response
         except Exception as e:
-            return f"缩略图访问失败: {str(e)}", 500
+            return f"文件访问失败: {str(e)}", 500
+
+    def _send(self, path):
+        """发送文件：按配置交给 nginx（X-Accel-Redirect）或由 Flask 发送（支持条件请求与 Range）"""
+        if Config.IMAGE_SENDFILE == 'x-accel-redirect':
+            relative = os.path.relpath(path, self.file_handler.upload_folder).replace(os.sep, '/')
+            response = Response(mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = Config.IMAGE_ACCEL_PREFIX + quote(relative)
+            return response
+        # x-sendfile 由 Flask 的 USE_X_SENDFILE 处理（只输出 X-Sendfile 头，不读文件）
+        return send_file(os.path.abspath(path), conditional=True)
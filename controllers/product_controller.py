@@ -8,7 +8,10 @@ from flask import Blueprint, request, jsonify, send_file, session, redirect, url
 from models.product import Product
 from services.export_service import ExportService
 from services.product_service import ProductService
+from services.import_service import ImportService
+from services.report_service import ReportService
 from models.user_pref import UserPreference
+from utils.http_cache import make_etag, not_modified, with_etag
 import logging
 
 # 使用主应用的日志配置
@@ -18,6 +21,8 @@ logger = get_logger(__name__)
 # 创建导出服务实例
 export_service = ExportService()
 product_service = ProductService()
+import_service = ImportService()
+report_service = ReportService()
 
 # 创建蓝图
 product_bp = Blueprint('product', __name__)
@@ -66,6 +71,23 @@ def add_product():
     except Exception as e:
         return jsonify({'success': False, 'message': f'添加失败: {str(e)}'})
 
+@product_bp.route('/import', methods=['POST'])
+def import_products():
+    """从CSV/xlsx批量导入商品"""
+    try:
+        if not ensure_logged_in():
+            return jsonify({'success': False, 'message': '未登录'}), 401
+        file = request.files.get('file')
+        # 文件中未填写营业员时，与录入一致使用当前登录用户
+        salesperson = (session.get('real_name') or session.get('username') or '').strip()
+        result = import_service.import_file(file, default_salesperson=salesperson or None)
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f'导入失败: {str(e)}')
+        import traceback
+        logger.error(traceback.format_exc())
+        return jsonify({'success': False, 'message': f'导入失败: {str(e)}'})
+
 @product_bp.route('/list', methods=['GET'])
 def get_products():
     """获取商品列表"""
@@ -79,13 +101,30 @@ def get_products():
         salesperson = request.args.get('salesperson', '')
         date_start = request.args.get('date_start', '')
         date_end = request.args.get('date_end', '')
+        # 宽泛筛选可请求近似总数，避免全量计数
+        approximate = request.args.get('approximate') in ('1', 'true', 'True')
+        # 投影字段（逗号分隔，id 总是返回）；shape=columnar 时按列返回
+        fields_param = request.args.get('fields', '')
+        columnar = request.args.get('shape') == 'columnar'
+        try:
+            fields = Product.list_fields([f.strip() for f in fields_param.split(',') if f.strip()]) if fields_param else None
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)})
+
+        # 商品表未变化且客户端已持有同一请求的结果时直接 304，不执行查询
+        etag = make_etag('list', Product.data_version(), sorted(request.args.items(multi=True)))
+        cached_response = not_modified(etag)
+        if cached_response is not None:
+            return cached_response
         
         result = Product.find_all(
             page, per_page, search,
             product_desc=product_desc or None,
             salesperson=salesperson or None,
             date_start=date_start or None,
-            date_end=date_end or None
+            date_end=date_end or None,
+            approximate=approximate,
+            fields=fields
         )
         logger.info(f"获取商品列表: total={result.get('total')}, page={page}, per_page={per_page}")
 
@@ -94,44 +133,80 @@ def get_products():
 
         products = result['products']
 
-        # 使用模型提供的 to_dict 进行序列化
-        products_data = [p.to_dict() if hasattr(p, 'to_dict') else p for p in products]
-
         # 构建与前端期望一致的结构
-        response_data = {
-            'success': True,
-            'data': {
-                'products': products_data,
-                'page': page,
-                'total_pages': result.get('total_pages', 1)
-            }
+        data = {
+            'page': page,
+            'total': result.get('total', 0),
+            'total_approximate': result.get('total_approximate', False),
+            'total_pages': result.get('total_pages', 1)
         }
+        if columnar:
+            # 每个字段一个数组，字段名不随每行重复
+            data.update(Product.to_columnar(products, fields), shape='columnar')
+        else:
+            # 使用模型提供的 to_dict 进行序列化
+            data['products'] = [p.to_dict() if hasattr(p, 'to_dict') else p for p in products]
+        response_data = {'success': True, 'data': data}
 
-        return jsonify(response_data)
+        return with_etag(jsonify(response_data), etag)
     except Exception as e:
         logger.error(f'获取商品列表失败: {str(e)}')
         import traceback
         logger.error(traceback.format_exc())
         return jsonify({'success': False, 'message': f'获取失败: {str(e)}'})
 
+@product_bp.route('/report', methods=['GET'])
+def product_report():
+    """按客户/营业员/月份等维度汇总数量与金额"""
+    try:
+        if not ensure_logged_in():
+            return jsonify({'success': False, 'message': '未登录'}), 401
+        filters = {
+            'search': request.args.get('search', ''),
+            'product_desc': request.args.get('product_desc', ''),
+            'salesperson': request.args.get('salesperson', ''),
+            'date_start': request.args.get('date_start', ''),
+            'date_end': request.args.get('date_end', ''),
+        }
+        result = report_service.get_report(request.args.get('group_by', 'customer'), filters)
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f'汇总失败: {str(e)}')
+        return jsonify({'success': False, 'message': f'汇总失败: {str(e)}'})
+
 @product_bp.route('/delete', methods=['POST'])
 def delete_product():
-    """删除商品"""
+    """删除商品（支持 id 或 ids 批量）"""
     try:
         if not ensure_logged_in():
             return jsonify({'success': False, 'message': '未登录'}), 401
-        data = request.get_json()
-        product_id = data.get('id')
+        data = request.get_json() or {}
+        product_ids = data.get('ids') or ([data.get('id')] if data.get('id') else [])
 
-        if not product_id:
+        if not product_ids:
             return jsonify({'success': False, 'message': '商品ID不能为空'})
 
-        # 使用服务层执行删除，统一处理图片与记录
-        result = product_service.delete_product(product_id)
+        # 使用服务层执行删除（软删除，图片与记录由后台任务清理）
+        result = product_service.delete_products(product_ids)
         return jsonify(result)
     except Exception as e:
         return jsonify({'success': False, 'message': f'删除失败: {str(e)}'})
 
+@product_bp.route('/restore', methods=['POST'])
+def restore_product():
+    """撤销删除（保留期内）"""
+    try:
+        if not ensure_logged_in():
+            return jsonify({'success': False, 'message': '未登录'}), 401
+        data = request.get_json() or {}
+        product_ids = data.get('ids') or ([data.get('id')] if data.get('id') else [])
+        if not product_ids:
+            return jsonify({'success': False, 'message': '商品ID不能为空'})
+        result = product_service.restore_products(product_ids)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'恢复失败: {str(e)}'})
+
 @product_bp.route('/update', methods=['POST'])
 def update_product():
     """更新商品"""
@@ -229,43 +304,43 @@ def export_products():
         selected_columns = [_to_export_key(k) for k in selected_internal_keys]
         
         logger.info(f"导出请求 - 选择的列(后端解析): {selected_columns}")
-        
-        # 获取所有商品数据
-        result = Product.find_all(
-            page=1, per_page=1000000,
-            search=filters.get('search'),
-            product_desc=filters.get('product_desc'),
-            salesperson=filters.get('salesperson'),
-            date_start=filters.get('date_start'),
-            date_end=filters.get('date_end')
-        )
-        products = result['products']
-        
-        logger.info(f"获取到 {len(products)} 条商品数据")
-        
-        # 转换为字典格式，确保所有数据都是JSON可序列化的
-        products_data = []
-        for product in products:
-            # 检查product是否为Product对象，如果是则转换为字典
-            if hasattr(product, '__dict__'):
-                product_dict = product.__dict__.copy()
-                # 移除SQLAlchemy内部属性
-                product_dict.pop('_sa_instance_state', None)
-                # 确保datetime对象转换为字符串
-                if 'create_time' in product_dict and product_dict['create_time']:
-                    product_dict['create_time'] = str(product_dict['create_time'])
-                products_data.append(product_dict)
-            else:
-                # 如果已经是字典，直接使用
-                products_data.append(product)
-        
-        logger.info(f"转换后的数据: {products_data[:2]}...")  # 显示前两条数据
-        
-        # 导出到Excel
-        excel_data = export_service.export_to_excel(products_data, selected_columns)
-        
-        if excel_data is None:
-            return jsonify({'success': False, 'message': '导出服务返回空数据'})
+
+        import platform
+        system_type = platform.system()
+
+        # 同一筛选与列设置在商品表未变化时复用本进程上次的导出结果
+        # （POST 响应不会被浏览器条件重验证，因此不返回 ETag/304）
+        version = Product.data_version()
+        cache_key = make_etag('export', version, filters, selected_columns, system_type)
+        excel_data = export_service.result_cache.get(cache_key, version)
+        if excel_data is not None:
+            logger.info(f"命中导出缓存: {len(excel_data)} 字节")
+        else:
+            # 获取所有商品数据（只读快照连接，导出期间不阻塞录入与批量保存）
+            result = Product.find_all(
+                page=1, per_page=1000000,
+                search=filters.get('search'),
+                product_desc=filters.get('product_desc'),
+                salesperson=filters.get('salesperson'),
+                date_start=filters.get('date_start'),
+                date_end=filters.get('date_end'),
+                readonly=True
+            )
+            products = result['products']
+
+            logger.info(f"获取到 {len(products)} 条商品数据")
+
+            # 查询结果为紧凑记录，支持 .get，可直接交给导出服务
+            products_data = products
+
+            logger.info(f"转换后的数据: {products_data[:2]}...")  # 显示前两条数据
+
+            # 导出到Excel
+            excel_data = export_service.export_to_excel(products_data, selected_columns)
+
+            if excel_data is None:
+                return jsonify({'success': False, 'message': '导出服务返回空数据'})
+            export_service.result_cache.set(cache_key, version, excel_data)
         
         logger.info(f"导出服务返回数据大小: {len(excel_data)} 字节")
         logger.info(f"文件头信息: {excel_data[:20]}")
@@ -277,11 +352,9 @@ def export_products():
         
         # 根据平台动态生成文件名
         from datetime import datetime
-        import platform
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
         # Windows下导出为xlsx，Mac/Linux下导出为xlsm
-        system_type = platform.system()
         if system_type == 'Windows':
             file_extension = 'xlsx'
             mime_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
@@ -302,12 +375,13 @@ def export_products():
         
         logger.info(f"✓ 准备返回文件，大小: {len(excel_data)} 字节")
         
-        return send_file(
+        response = send_file(
             excel_file,
             mimetype=mime_type,
             as_attachment=True,
             download_name=filename
         )
+        return response
         
     except Exception as e:
         logger.error(f'导出失败: {str(e)}')
@@ -337,10 +411,15 @@ def load_columns_pref():
     try:
         if not ensure_logged_in():
             return jsonify({'success': False, 'message': '未登录'}), 401
-        val = UserPreference.get_pref(session.get('user_id'), 'export_columns')
+        user_id = session.get('user_id')
+        etag = make_etag('columns', UserPreference.data_version(), user_id)
+        cached_response = not_modified(etag)
+        if cached_response is not None:
+            return cached_response
+        val = UserPreference.get_pref(user_id, 'export_columns')
         import json
         cfg = json.loads(val) if val else []
-        return jsonify({'success': True, 'data': cfg})
+        return with_etag(jsonify({'success': True, 'data': cfg}), etag)
     except Exception as e:
         logger.error(f'读取列设置失败: {str(e)}')
         return jsonify({'success': False, 'message': f'读取失败: {str(e)}'})
@@ -361,6 +440,24 @@ def batch_update_products():
         logger.error(traceback.format_exc())
         return jsonify({'success': False, 'message': f'批量更新失败: {str(e)}'})
 
+@product_bp.route('/batch_update_image', methods=['POST'])
+def batch_update_product_images():
+    """批量替换商品图片：表单中按顺序重复 id 与 image 字段，一一对应"""
+    try:
+        if not ensure_logged_in():
+            return jsonify({'success': False, 'message': '未登录'}), 401
+        product_ids = request.form.getlist('id')
+        image_files = request.files.getlist('image')
+        if not product_ids or len(product_ids) != len(image_files):
+            return jsonify({'success': False, 'message': '商品ID与图片数量不一致'})
+        result = product_service.batch_update_images(list(zip(product_ids, image_files)))
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f'批量更新图片失败: {str(e)}')
+        import traceback
+        logger.error(traceback.format_exc())
+        return jsonify({'success': False, 'message': f'批量更新图片失败: {str(e)}'})
+
 @product_bp.route('/update_image', methods=['POST'])
 def update_product_image():
     """更新或删除商品图片"""
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 配置（Linux 生产部署）：gunicorn -c gunicorn.conf.py wsgi:application
+
+主进程预加载应用（建表/升级、静态资源清单只执行一次），再 fork 出多个 worker 并行处理请求。
+"""
+
+from config import Config
+
+bind = Config.WEB_BIND
+workers = Config.WEB_WORKERS
+# 每个 worker 使用线程处理并发请求（导出、上传等 I/O 期间不阻塞同进程的其他请求）
+worker_class = 'gthread'
+threads = Config.WEB_THREADS
+timeout = Config.WEB_TIMEOUT
+# fork 前在主进程导入应用，数据库初始化只执行一次，worker 共享已加载的代码
+preload_app = True
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    """线程不会随 fork 复制，每个 worker 启动自己的后台清理与缩略图线程池（清理只在持有清理锁的 worker 中执行）"""
+    from app_mvc import start_background_services
+    start_background_services()
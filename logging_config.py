@@ -6,6 +6,7 @@
 
 import logging
 import os
+import threading
 from datetime import datetime
 
 # 全局变量，避免重复配置
@@ -53,3 +54,25 @@ def get_logger(name):
     if not _logging_configured:
         setup_logging()
     return logging.getLogger(name)
+
+_slow_query_logger = None
+# 多线程首次获取时只添加一次 handler
+_slow_query_lock = threading.Lock()
+
+def get_slow_query_logger():
+    """慢查询日志记录器：单独写入 logs/slow_query_YYYYMMDD.log，同时进入主日志"""
+    global _slow_query_logger
+    if _slow_query_logger is not None:
+        return _slow_query_logger
+    with _slow_query_lock:
+        if _slow_query_logger is not None:
+            return _slow_query_logger
+        if not _logging_configured:
+            setup_logging()
+        logger = logging.getLogger('slow_query')
+        log_date = datetime.now().strftime('%Y%m%d')
+        handler = logging.FileHandler(f'logs/slow_query_{log_date}.log', encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        logger.addHandler(handler)
+        _slow_query_logger = logger
+        return logger
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+按年份分区的商品归档库
+
+已结账年份（按单据日期）的数据迁出到 archive/products_<年份>.db，主库 products 只保留近期数据。
+查询时按日期范围只 ATTACH 涉及到的年份库，与主表 UNION ALL 后再筛选；
+未指定日期范围的查询（如默认列表）只查主库，保留主表索引上的排序与分页。
+归档数据只读：修改、删除仅作用于主库；查询结果带 archived 列（归档行为 1），界面据此禁用修改与删除。
+"""
+
+import os
+import re
+import threading
+from datetime import datetime
+
+from models.database import db_manager
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 单据日期表达式（与列表筛选一致）
+DOC_DATE_EXPR = "COALESCE(doc_date, substr(create_time,1,10))"
+
+_ARCHIVE_FILE = re.compile(r'^products_(\d{4})\.db$')
+
+# 单次查询最多附加的归档库数（SQLite 默认最多附加 10 个库）
+MAX_ATTACHED_ARCHIVES = 8
+
+
+def _year(value):
+    """日期参数（YYYY-MM-DD）的年份；为空或无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').year
+    except ValueError:
+        return None
+
+
+class ProductArchive:
+    """商品归档管理"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 目录 mtime 不变时复用年份列表
+        self._years_cache = (None, [])
+        # (路径, mtime) -> 列集合
+        self._columns_cache = {}
+        self._main_columns = None
+
+    @property
+    def archive_dir(self):
+        return db_manager.config.get_archive_dir()
+
+    def archive_path(self, year):
+        return os.path.join(self.archive_dir, f'products_{int(year)}.db')
+
+    def list_years(self):
+        """已存在的归档年份（升序）"""
+        try:
+            mtime = os.stat(self.archive_dir).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            if self._years_cache[0] == mtime:
+                return self._years_cache[1]
+            years = sorted(
+                int(m.group(1)) for m in map(_ARCHIVE_FILE.match, os.listdir(self.archive_dir)) if m
+            )
+            self._years_cache = (mtime, years)
+            return years
+
+    def years_for_range(self, date_start=None, date_end=None):
+        """日期范围涉及到的归档年份；两端都未指定（或无法解析）时不查归档，只限定一端时另一端不限"""
+        start_year, end_year = _year(date_start), _year(date_end)
+        if start_year is None and end_year is None:
+            return []
+        years = [y for y in self.list_years()
+                 if (start_year is None or y >= start_year) and (end_year is None or y <= end_year)]
+        if len(years) > MAX_ATTACHED_ARCHIVES:
+            raise ValueError(f"日期范围涉及 {len(years)} 个归档年份，单次最多查询 {MAX_ATTACHED_ARCHIVES} 个，请缩小日期范围")
+        return years
+
+    def main_columns(self):
+        """主库 products 的列顺序（迁移在启动时完成，进程内缓存）"""
+        if self._main_columns is None:
+            rows = db_manager.execute_query("PRAGMA table_info(products)", label='ProductArchive.main_columns')
+            self._main_columns = [r['name'] for r in rows]
+        return self._main_columns
+
+    def _archive_columns(self, year):
+        path = self.archive_path(year)
+        key = (path, os.stat(path).st_mtime_ns)
+        columns = self._columns_cache.get(key)
+        if columns is None:
+            rows = db_manager.execute_query(
+                "PRAGMA arch.table_info(products)", readonly=True, attach={'arch': path},
+                label='ProductArchive.archive_columns'
+            )
+            columns = {r['name'] for r in rows}
+            self._columns_cache[key] = columns
+        return columns
+
+    def source(self, date_start=None, date_end=None):
+        """返回 (FROM 子句, 需附加的库)；不涉及归档时即主表 products
+
+        涉及归档时子查询比主表多一列 archived（主库行为 0，归档行为 1）。
+        """
+        years = self.years_for_range(date_start, date_end)
+        if not years:
+            return 'products', None
+        columns = self.main_columns()
+        col_list = ', '.join(columns)
+        selects = [f"SELECT {col_list}, 0 AS archived FROM main.products"]
+        attach = {}
+        for year in years:
+            alias = f"arch_{year}"
+            attach[alias] = self.archive_path(year)
+            have = self._archive_columns(year)
+            # 归档后主库新增的列在归档库中补 NULL
+            cols = ', '.join(c if c in have else f"NULL AS {c}" for c in columns)
+            selects.append(f"SELECT {cols}, 1 AS archived FROM {alias}.products")
+        return f"({' UNION ALL '.join(selects)}) AS products", attach
+
+    def archived_ids(self, ids):
+        """给定ID中已迁入归档库的部分（修改、删除未命中主库时用于提示）"""
+        ids = list(ids)
+        found = set()
+        if not ids:
+            return found
+        placeholders = ', '.join('?' * len(ids))
+        for year in self.list_years():
+            rows = db_manager.execute_query(
+                f"SELECT id FROM arch.products WHERE id IN ({placeholders})",
+                tuple(ids), readonly=True, attach={'arch': self.archive_path(year)},
+                label='ProductArchive.archived_ids'
+            )
+            found.update(r['id'] for r in rows)
+        return found
+
+    def referenced_images(self, image_paths):
+        """归档数据仍在引用的图片（归档行只读，其图片不可释放）"""
+        image_paths = list(image_paths)
+        referenced = set()
+        if not image_paths:
+            return referenced
+        placeholders = ', '.join('?' * len(image_paths))
+        for year in self.list_years():
+            rows = db_manager.execute_query(
+                f"SELECT DISTINCT image_path FROM arch.products WHERE image_path IN ({placeholders})",
+                tuple(image_paths), readonly=True, attach={'arch': self.archive_path(year)},
+                label='ProductArchive.referenced_images'
+            )
+            referenced.update(r['image_path'] for r in rows)
+        return referenced
+
+    def archive_before(self, before_year):
+        """将单据年份早于 before_year 的数据按年迁入归档库，返回 {年份: 迁移条数}"""
+        before_year = int(before_year)
+        rows = db_manager.execute_query(
+            f"SELECT DISTINCT substr({DOC_DATE_EXPR}, 1, 4) AS y FROM products "
+            f"WHERE {DOC_DATE_EXPR} < ?",
+            (f"{before_year:04d}-01-01",)
+        )
+        years = sorted(int(r['y']) for r in rows if r['y'] and str(r['y']).isdigit())
+        os.makedirs(self.archive_dir, exist_ok=True)
+        moved = {}
+        for year in years:
+            moved[year] = self._archive_year(year)
+            logger.info(f"归档完成: {year} 年 {moved[year]} 条")
+        return moved
+
+    def _archive_year(self, year):
+        """迁移单个年份：同一事务内复制到归档库并从主库删除（可重复执行）"""
+        path = self.archive_path(year)
+        with db_manager.transaction(label='ProductArchive.archive_year', attach={'arch': path}) as connection:
+            create_sql = connection.execute(
+                "SELECT sql FROM main.sqlite_master WHERE type='table' AND name='products'"
+            ).fetchone()[0]
+            connection.execute(re.sub(r'^CREATE TABLE\s+"?products"?', 'CREATE TABLE IF NOT EXISTS arch.products',
+                                      create_sql, count=1))
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS arch.idx_products_doc_date ON products({DOC_DATE_EXPR})"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS arch.idx_products_image_path ON products(image_path) "
+                "WHERE image_path IS NOT NULL"
+            )
+            main_cols = [r[1] for r in connection.execute("PRAGMA main.table_info(products)")]
+            arch_cols = {r[1] for r in connection.execute("PRAGMA arch.table_info(products)")}
+            for col in main_cols:
+                if col not in arch_cols:
+                    connection.execute(f"ALTER TABLE arch.products ADD COLUMN {col}")
+
+            col_list = ', '.join(main_cols)
+            # 已软删除的数据留在主库，由清理任务处理
+            year_filter = f"{DOC_DATE_EXPR} >= ? AND {DOC_DATE_EXPR} < ? AND deleted_at IS NULL"
+            params = (f"{year:04d}-01-01", f"{year + 1:04d}-01-01")
+            connection.execute(
+                f"INSERT OR IGNORE INTO arch.products ({col_list}) "
+                f"SELECT {col_list} FROM main.products WHERE {year_filter}", params
+            )
+            cursor = connection.execute(f"DELETE FROM main.products WHERE {year_filter}", params)
+            return cursor.rowcount
+
+
+# 全局归档实例
+product_archive = ProductArchive()
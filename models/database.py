@@ -5,68 +5,313 @@
 
 import sqlite3
 import os
+import sys
+import threading
+import time
+from collections import namedtuple
+import contextlib
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import compress
+from urllib.parse import quote
+
+from models.query_stats import query_stats
+
+_SKIP_FRAME_FILES = {__file__, contextlib.__file__}
+
+
+class RecordMixin:
+    """查询结果记录的公共方法（记录本身是 namedtuple，无实例 __dict__）"""
+    __slots__ = ()
+
+    def get(self, key, default=None):
+        """按列名取值，兼容原字典行的 .get 用法"""
+        index = self._index.get(key)
+        return self[index] if index is not None else default
+
+    def to_dict(self):
+        """转换为字典（以下划线开头的辅助列不输出）"""
+        if self._hidden_trailing:
+            # 辅助列都在末尾时 zip 自然截断，无需逐列筛选
+            return dict(zip(self._public_fields, self))
+        return dict(zip(self._public_fields, compress(self, self._public_mask)))
+
+
+# 列描述 -> 记录类型，同一列集合只构造一次；最多保留 RECORD_TYPE_CACHE_SIZE 个，超出时淘汰最早构造的
+RECORD_TYPE_CACHE_SIZE = 256
+_record_types = {}
+_record_types_lock = threading.Lock()
+
+
+def record_type(columns, name='Record'):
+    """按游标列描述获取（或构造）对应的紧凑记录类型"""
+    key = (name, columns)
+    rtype = _record_types.get(key)
+    if rtype is None:
+        with _record_types_lock:
+            rtype = _record_types.get(key)
+            if rtype is None:
+                base = namedtuple(name, columns, rename=True)
+                public_mask = tuple(not c.startswith('_') for c in columns)
+                public_count = sum(public_mask)
+                rtype = type(name, (base, RecordMixin), {
+                    '__slots__': (),
+                    '_index': {c: i for i, c in enumerate(columns)},
+                    '_public_mask': public_mask,
+                    '_public_fields': tuple(compress(columns, public_mask)),
+                    '_hidden_trailing': all(public_mask[:public_count]),
+                })
+                if len(_record_types) >= RECORD_TYPE_CACHE_SIZE:
+                    # 已淘汰类型的记录仍可正常使用，再次查询时重新构造
+                    del _record_types[next(iter(_record_types))]
+                _record_types[key] = rtype
+    return rtype
 
 class DatabaseConfig:
     """数据库配置类"""
     
     def __init__(self):
         self.database_path = os.getenv('DATABASE_PATH', 'products.db')
+        # 历史年份归档库目录，默认与主库同目录下的 archive/
+        self.archive_dir = os.getenv('ARCHIVE_DIR') or os.path.join(
+            os.path.dirname(os.path.abspath(self.database_path)), 'archive'
+        )
     
     def get_database_path(self):
         """获取数据库文件路径"""
         return self.database_path
 
+    def get_archive_dir(self):
+        """获取归档库目录"""
+        return self.archive_dir
+
+def _caller_label():
+    """取数据库层之外的第一个调用方作为标签，如 Product.find_all"""
+    frame = sys._getframe(2)
+    # 跳过本模块与 contextmanager 包装层
+    while frame is not None and frame.f_code.co_filename in _SKIP_FRAME_FILES:
+        frame = frame.f_back
+    if frame is None:
+        return 'unknown'
+    code = frame.f_code
+    return getattr(code, 'co_qualname', code.co_name)
+
+
 class DatabaseManager:
     """数据库管理器"""
     
     def __init__(self):
         self.config = DatabaseConfig()
         self.db_path = self.config.get_database_path()
+        # 数据版本探测连接（只读 PRAGMA，不参与读写），按进程惰性创建
+        self._version_conn = None
+        self._version_pid = None
+        self._version_lock = threading.Lock()
+        # 表级版本缓存，对应的 PRAGMA data_version
+        self._table_versions = {}
+        self._table_versions_dv = None
     
     def get_connection(self):
         """获取数据库连接"""
         return sqlite3.connect(self.db_path)
-    
-    def execute_query(self, sql, params=None):
-        """执行查询语句"""
-        connection = self.get_connection()
+
+    def get_read_connection(self):
+        """获取只读连接（mode=ro + query_only），用于导出、报表等长查询
+
+        库处于 WAL 模式时，只读连接读取的是开始时的快照，不阻塞写入方。
+        """
+        uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+        connection = sqlite3.connect(uri, uri=True)
+        connection.execute("PRAGMA query_only = 1")
+        return connection
+
+    @contextmanager
+    def snapshot(self, attach=None):
+        """只读快照：同一连接内的多条查询看到一致的数据（把连接传给 execute_query 等的 connection 参数）
+
+        attach 为需附加的归档库，须在事务开始前附加。
+        """
+        connection = self.get_read_connection()
+        connection.isolation_level = None
         try:
+            self._attach(connection, attach, readonly=True)
+            connection.execute("BEGIN")
+            yield connection
+        finally:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            connection.close()
+
+    def _monitor_connection(self):
+        """版本探测用的常驻连接（从不写入），按进程惰性创建；调用方需持有 _version_lock"""
+        pid = os.getpid()
+        if self._version_conn is None or self._version_pid != pid:
+            # fork 后不可复用父进程的连接
+            self._version_conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._version_pid = pid
+            self._table_versions = {}
+            self._table_versions_dv = None
+        return self._version_conn
+
+    def data_version(self):
+        """返回数据库数据版本号，任何连接（含其他进程）提交写入后都会变化。
+
+        基于 PRAGMA data_version：对一条从不写入的常驻连接而言，
+        其他连接每次提交都会使该值变化，可用于缓存失效判断。
+        该值仅在本进程内可比较，跨进程请使用 table_version。
+        """
+        with self._version_lock:
+            return self._monitor_connection().execute("PRAGMA data_version").fetchone()[0]
+
+    def table_version(self, name):
+        """返回表级变更计数（table_versions，由触发器维护），跨进程一致，可用于 ETag
+
+        库未发生任何提交时（PRAGMA data_version 不变）直接返回进程内缓存值。
+        """
+        with self._version_lock:
+            connection = self._monitor_connection()
+            data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._table_versions_dv:
+                self._table_versions = {}
+                self._table_versions_dv = data_version
+            version = self._table_versions.get(name)
+            if version is None:
+                row = connection.execute("SELECT version FROM table_versions WHERE name = ?", (name,)).fetchone()
+                version = row[0] if row else 0
+                self._table_versions[name] = version
+            return version
+
+    def _observe(self, connection, label, sql, params, started, rows):
+        """记录耗时；超过阈值写慢查询日志并附带执行计划"""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        query_stats.record(label, sql, elapsed_ms, rows)
+        if query_stats.is_slow(elapsed_ms):
+            from logging_config import get_slow_query_logger
+            plan = self._explain(connection, sql, params) if connection is not None else []
+            get_slow_query_logger().warning(
+                f"慢查询 {elapsed_ms:.1f}ms [{label}] rows={rows} sql={' '.join(sql.split())} "
+                f"params={tuple(params or ())!r} plan={plan}"
+            )
+
+    def _explain(self, connection, sql, params):
+        """获取语句的 EXPLAIN QUERY PLAN（不会真正执行语句）"""
+        try:
+            rows = connection.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+            return [row[-1] for row in rows]
+        except Exception as e:
+            return [f'执行计划获取失败: {e}']
+
+    def _attach(self, connection, attach, readonly):
+        """按 {别名: 文件路径} 附加归档库"""
+        for alias, path in (attach or {}).items():
+            if readonly:
+                target = f"file:{quote(os.path.abspath(path))}?mode=ro"
+            else:
+                target = path
+            connection.execute("ATTACH DATABASE ? AS " + alias, (target,))
+
+    @contextmanager
+    def _query_connection(self, readonly, attach, connection):
+        """查询所用连接：传入 connection（如 snapshot）时直接使用且不关闭，否则新建并在结束时关闭"""
+        if connection is not None:
+            yield connection
+            return
+        connection = self.get_read_connection() if readonly else self.get_connection()
+        try:
+            self._attach(connection, attach, readonly)
+            yield connection
+        finally:
+            connection.close()
+
+    def execute_query(self, sql, params=None, readonly=False, label=None, attach=None, connection=None):
+        """执行查询语句；readonly=True 时走只读快照连接，attach 为需附加的归档库；
+        connection 为 snapshot() 提供的连接时在其上执行（归档库由 snapshot 附加）
+        """
+        label = label or _caller_label()
+        with self._query_connection(readonly, attach, connection) as connection:
+            started = time.perf_counter()
             cursor = connection.cursor()
             cursor.execute(sql, params or ())
             columns = [description[0] for description in cursor.description]
             rows = cursor.fetchall()
             
             # 转换为字典格式，兼容原来的代码
-            result = []
-            for row in rows:
-                row_dict = {}
-                for i, column in enumerate(columns):
-                    row_dict[column] = row[i]
-                result.append(row_dict)
-            
+            result = [dict(zip(columns, row)) for row in rows]
+            self._observe(connection, label, sql, params, started, len(result))
+            return result
+    
+    def execute_query_records(self, sql, params=None, name='Record', readonly=False, label=None, attach=None,
+                              connection=None):
+        """执行查询，返回紧凑记录列表（按列描述复用记录类型，不构造中间字典）"""
+        label = label or _caller_label()
+        with self._query_connection(readonly, attach, connection) as connection:
+            started = time.perf_counter()
+            cursor = connection.cursor()
+            cursor.execute(sql, params or ())
+            columns = tuple(description[0] for description in cursor.description)
+            result = list(map(record_type(columns, name)._make, cursor.fetchall()))
+            self._observe(connection, label, sql, params, started, len(result))
             return result
-        finally:
-            connection.close()
     
-    def execute_update(self, sql, params=None):
+    def execute_update(self, sql, params=None, label=None):
         """执行更新语句"""
+        label = label or _caller_label()
         connection = self.get_connection()
         try:
+            started = time.perf_counter()
             cursor = connection.cursor()
             cursor.execute(sql, params or ())
             connection.commit()
+            self._observe(connection, label, sql, params, started, cursor.rowcount)
             return cursor.rowcount
         finally:
             connection.close()
     
-    def execute_insert(self, sql, params=None):
+    @contextmanager
+    def transaction(self, label=None, record=True, attach=None):
+        """写事务：同一连接内执行多条语句，成功统一提交，异常整体回滚
+        整个事务作为一条 <transaction> 记录计入耗时统计；attach 为需附加的库（事务开始前附加）
+        """
+        label = label or _caller_label()
+        connection = self.get_connection()
+        # 手动管理事务，立即获取写锁，避免读升级写时的锁冲突
+        connection.isolation_level = None
+        try:
+            self._attach(connection, attach, readonly=False)
+            started = time.perf_counter()
+            connection.execute("BEGIN IMMEDIATE")
+            yield connection
+            connection.execute("COMMIT")
+            if record:
+                self._observe(None, label, '<transaction>', None, started, connection.total_changes)
+        except Exception:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def execute_many(self, sql, seq_of_params, label=None):
+        """在单个事务中批量执行同一语句，返回影响行数"""
+        label = label or _caller_label()
+        with self.transaction(label=label, record=False) as connection:
+            started = time.perf_counter()
+            cursor = connection.executemany(sql, seq_of_params)
+            # 执行计划只取首组参数
+            first = seq_of_params[0] if isinstance(seq_of_params, (list, tuple)) and seq_of_params else None
+            self._observe(connection, label, sql, first, started, cursor.rowcount)
+            return cursor.rowcount
+    
+    def execute_insert(self, sql, params=None, label=None):
         """执行插入语句，返回插入的ID"""
+        label = label or _caller_label()
         connection = self.get_connection()
         try:
+            started = time.perf_counter()
             cursor = connection.cursor()
             cursor.execute(sql, params or ())
             connection.commit()
+            self._observe(connection, label, sql, params, started, cursor.rowcount)
             return cursor.lastrowid
         finally:
             connection.close()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+图片后台处理任务记录
+"""
+
+from models.database import db_manager
+
+
+class ImageTask:
+    """图片处理任务：pending -> running（已认领）-> done / failed，按 (文件名, 类型) 去重"""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    # 登记任务；同一文件的同类任务已存在时重置为待处理（正在处理中的保持不变）
+    _ENQUEUE_SQL = '''
+        INSERT INTO image_tasks (filename, kind, status, attempts)
+        VALUES (?, ?, 'pending', 0)
+        ON CONFLICT (filename, kind) DO UPDATE SET
+            status = 'pending', attempts = 0, last_error = NULL, owner = NULL, claimed_at = NULL,
+            update_time = datetime('now', 'localtime')
+        WHERE image_tasks.status != 'running'
+    '''
+
+    @classmethod
+    def enqueue(cls, filename, kind='thumbnail'):
+        """登记待处理任务；同一文件的同类任务已存在时重置为待处理（正在处理中的保持不变）"""
+        db_manager.execute_update(cls._ENQUEUE_SQL, (filename, kind))
+
+    @classmethod
+    def enqueue_many(cls, filenames, kind='thumbnail'):
+        """在一个事务内登记多个任务"""
+        params = [(filename, kind) for filename in dict.fromkeys(filenames) if filename]
+        if params:
+            db_manager.execute_many(cls._ENQUEUE_SQL, params)
+
+    @classmethod
+    def claim(cls, filename, owner, lease_seconds, kind='thumbnail'):
+        """原子认领任务：待处理或认领已超时的任务置为 running，成功返回 True（其他进程已认领时返回 False）"""
+        affected = db_manager.execute_update('''
+            UPDATE image_tasks SET status = 'running', owner = ?, claimed_at = datetime('now', 'localtime'),
+                update_time = datetime('now', 'localtime')
+            WHERE filename = ? AND kind = ?
+              AND (status = 'pending'
+                   OR (status = 'running' AND claimed_at <= datetime('now', 'localtime', ?)))
+        ''', (owner, filename, kind, f'-{int(lease_seconds)} seconds'))
+        return affected == 1
+
+    @classmethod
+    def mark_done(cls, filename, kind='thumbnail'):
+        db_manager.execute_update('''
+            UPDATE image_tasks SET status = 'done', last_error = NULL, owner = NULL, claimed_at = NULL,
+                update_time = datetime('now', 'localtime')
+            WHERE filename = ? AND kind = ?
+        ''', (filename, kind))
+
+    @classmethod
+    def mark_failed(cls, filename, error, max_attempts, kind='thumbnail'):
+        """记录一次失败；未达最大重试次数时保持待处理，下次启动重新入队"""
+        db_manager.execute_update('''
+            UPDATE image_tasks SET
+                attempts = attempts + 1,
+                status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END,
+                last_error = ?, owner = NULL, claimed_at = NULL,
+                update_time = datetime('now', 'localtime')
+            WHERE filename = ? AND kind = ?
+        ''', (max_attempts, str(error)[:500], filename, kind))
+
+    @classmethod
+    def status(cls, filename, kind='thumbnail'):
+        """任务状态；没有任务记录时返回 None"""
+        rows = db_manager.execute_query(
+            "SELECT status FROM image_tasks WHERE filename = ? AND kind = ?", (filename, kind)
+        )
+        return rows[0]['status'] if rows else None
+
+    @classmethod
+    def pending(cls, kind='thumbnail', limit=1000, lease_seconds=None):
+        """待处理任务的文件名列表（按登记顺序）；指定 lease_seconds 时包含认领已超时的任务"""
+        if lease_seconds is None:
+            rows = db_manager.execute_query(
+                "SELECT filename FROM image_tasks WHERE status = 'pending' AND kind = ? ORDER BY id LIMIT ?",
+                (kind, limit)
+            )
+        else:
+            rows = db_manager.execute_query('''
+                SELECT filename FROM image_tasks
+                WHERE status IN ('pending', 'running') AND kind = ?
+                  AND (status = 'pending' OR claimed_at <= datetime('now', 'localtime', ?))
+                ORDER BY id LIMIT ?
+            ''', (kind, f'-{int(lease_seconds)} seconds', limit))
+        return [row['filename'] for row in rows]
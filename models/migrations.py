@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+数据库版本化迁移（基于 PRAGMA user_version）
+
+启动时只读取一次 user_version；已是最新版本则直接返回。
+新增列或索引时在 MIGRATIONS 末尾追加一项，函数需可重复执行（幂等）。
+"""
+
+import re
+import sqlite3
+
+from werkzeug.security import generate_password_hash
+
+from models.database import db_manager
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 商品表后续新增列: 列名 -> SQL 片段
+PRODUCT_EXTRA_COLUMNS = {
+    'doc_date': "TEXT DEFAULT (date('now','+8 hours'))",
+    'customer_name': "TEXT",
+    'product_desc': "TEXT",
+    'unit': "TEXT",
+    'unit_price': "REAL",
+    'unit_discount_rate': "REAL DEFAULT 100",
+    'unit_price_discounted': "REAL",
+    'amount': "REAL",
+    'remark': "TEXT",
+    'freight': "REAL DEFAULT 0",
+    'order_discount_rate': "REAL DEFAULT 100",
+    'amount_discounted': "REAL",
+    'receivable': "REAL",
+    'payment_current': "REAL DEFAULT 0",
+    'paid_total': "REAL DEFAULT 0",
+    'balance': "REAL",
+    'settlement_account': "TEXT",
+    'description': "TEXT",
+    'salesperson': "TEXT",
+    'update_time': "TEXT DEFAULT (datetime('now','+8 hours'))"
+}
+
+
+def _add_missing_columns(connection, table, columns):
+    """为已存在表补齐缺失列（只做 ADD COLUMN）"""
+    have = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+    for col, ddl in columns.items():
+        if col in have:
+            continue
+        try:
+            connection.execute(f"ALTER TABLE {table} ADD COLUMN {col} {ddl}")
+        except sqlite3.OperationalError as e:
+            # 非空表不允许添加非常量默认值：退化为不带默认值的列，
+            # 已有行保持 NULL（读取时按 create_time 兜底），新写入均显式赋值
+            match = re.match(r"(\w+)\s+DEFAULT\s+\(.*\)$", ddl)
+            if 'non-constant default' not in str(e) or not match:
+                raise
+            connection.execute(f"ALTER TABLE {table} ADD COLUMN {col} {match.group(1)}")
+
+
+def _v1_baseline(connection):
+    """基础表结构：商品、用户、用户偏好，以及默认管理员"""
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            quantity INTEGER NOT NULL,
+            spec TEXT,
+            image_path TEXT,
+            create_time TEXT DEFAULT (datetime('now','+8 hours'))
+        )
+    ''')
+    _add_missing_columns(connection, 'products', PRODUCT_EXTRA_COLUMNS)
+
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password_hash TEXT NOT NULL,
+            is_admin INTEGER DEFAULT 0,
+            real_name TEXT,
+            create_time TEXT DEFAULT (datetime('now'))
+        )
+    ''')
+    # 兼容旧库：若缺少 real_name 列则新增
+    _add_missing_columns(connection, 'users', {'real_name': 'TEXT'})
+
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS user_preferences (
+            user_id INTEGER NOT NULL,
+            pref_key TEXT NOT NULL,
+            pref_value TEXT,
+            PRIMARY KEY (user_id, pref_key)
+        )
+    ''')
+
+    # 确保存在admin账号（用户名: admin, 密码: admin, 姓名: admin）
+    connection.execute(
+        'INSERT OR IGNORE INTO users (username, password_hash, is_admin, real_name) VALUES (?, ?, ?, ?)',
+        ('admin', generate_password_hash('admin'), 1, 'admin')
+    )
+
+
+def _v2_list_indexes(connection):
+    """列表查询索引：按创建时间倒序分页、按单据日期范围筛选"""
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_products_create_time ON products(create_time)")
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_products_doc_date "
+        "ON products(COALESCE(doc_date, substr(create_time,1,10)))"
+    )
+
+
+# 派生金额列的计算（与导出口径一致：折后单价×数量→金额，整单折扣→折后金额，+运费→应收款，-已收款→尾款）
+# 注意：折扣率为 NULL 时按 100（不打折）计算；原导出把 NULL 折扣率当作 0，历史数据回填后以此处口径为准
+_UNIT_NET = "COALESCE(unit_price, price, 0) * COALESCE(unit_discount_rate, 100) / 100.0"
+_AMOUNT = f"({_UNIT_NET}) * COALESCE(quantity, 0)"
+_DISCOUNTED = f"({_AMOUNT}) * COALESCE(order_discount_rate, 100) / 100.0"
+_RECEIVABLE = f"({_DISCOUNTED}) + COALESCE(freight, 0)"
+DERIVED_COLUMNS_SET_SQL = f"""
+    unit_price_discounted = ROUND({_UNIT_NET}, 2),
+    amount = ROUND({_AMOUNT}, 2),
+    amount_discounted = ROUND({_DISCOUNTED}, 2),
+    receivable = ROUND({_RECEIVABLE}, 2),
+    balance = ROUND(({_RECEIVABLE}) - COALESCE(paid_total, 0), 2)
+"""
+# 参与派生计算的基础列，任一变化即重算
+DERIVED_SOURCE_COLUMNS = (
+    'price', 'quantity', 'unit_price', 'unit_discount_rate',
+    'order_discount_rate', 'freight', 'paid_total'
+)
+
+
+def _v3_derived_amounts(connection):
+    """金额/折后金额/应收款/尾款落库：由触发器在每条写入路径上维护，并回填已有数据
+
+    折扣率为 NULL 视为不打折（100），与原导出把 NULL 当作 0 的口径不同。
+    """
+    connection.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_products_derived_insert
+        AFTER INSERT ON products
+        BEGIN
+            UPDATE products SET {DERIVED_COLUMNS_SET_SQL} WHERE id = NEW.id;
+        END
+    ''')
+    connection.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_products_derived_update
+        AFTER UPDATE OF {', '.join(DERIVED_SOURCE_COLUMNS)} ON products
+        BEGIN
+            UPDATE products SET {DERIVED_COLUMNS_SET_SQL} WHERE id = NEW.id;
+        END
+    ''')
+    # 一次性回填
+    connection.execute(f"UPDATE products SET {DERIVED_COLUMNS_SET_SQL}")
+
+
+def _v4_wal_journal(connection):
+    """切换为 WAL 日志模式（持久化在库文件中）：读者读取快照，不再阻塞写入"""
+    mode = connection.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    if str(mode).lower() != 'wal':
+        raise RuntimeError(f"无法切换到WAL模式，当前: {mode}")
+
+
+# journal_mode 不能在事务内修改，此类迁移在事务外执行（本身幂等）
+_v4_wal_journal.outside_transaction = True
+
+
+def _v5_soft_delete(connection):
+    """软删除：deleted_at 非空即视为已删除，由后台清理任务分批物理删除"""
+    _add_missing_columns(connection, 'products', {'deleted_at': 'TEXT'})
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_products_deleted_at ON products(deleted_at) WHERE deleted_at IS NOT NULL"
+    )
+
+
+# 维护变更计数的表
+VERSIONED_TABLES = ('products', 'user_preferences')
+
+
+def _v6_table_versions(connection):
+    """表级变更计数：由触发器在每次增删改时递增，用于 ETag 与跨进程缓存失效"""
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for table in VERSIONED_TABLES:
+        connection.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)", (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            connection.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+                END
+            ''')
+
+
+def _v7_image_tasks(connection):
+    """图片后台处理任务（缩略图等），进程重启后未完成的任务可重新入队"""
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS image_tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            kind TEXT NOT NULL DEFAULT 'thumbnail',
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            create_time TEXT DEFAULT (datetime('now', 'localtime')),
+            update_time TEXT DEFAULT (datetime('now', 'localtime')),
+            UNIQUE (filename, kind)
+        )
+    ''')
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_image_tasks_pending ON image_tasks(kind, id) WHERE status = 'pending'"
+    )
+
+
+def _v8_image_path_index(connection):
+    """图片按内容寻址、多条商品可共用同一文件：按 image_path 统计引用需要索引"""
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_products_image_path ON products(image_path) WHERE image_path IS NOT NULL"
+    )
+
+
+# 上传时记录的图片元数据列
+IMAGE_META_COLUMNS = {
+    'image_width': 'INTEGER',
+    'image_height': 'INTEGER',
+    'image_bytes': 'INTEGER',
+    'image_format': 'TEXT',
+    'image_hash': 'TEXT',
+}
+
+
+def _v9_image_meta(connection):
+    """图片元数据：导出与前端据此排版，无需逐行打开文件；历史数据为 NULL"""
+    _add_missing_columns(connection, 'products', IMAGE_META_COLUMNS)
+
+
+def _create_products_version_update_trigger(connection):
+    """重建商品表的 UPDATE 计数触发器：只有派生列以外的列变化时才递增
+
+    派生金额触发器重算时只写派生列，若也计数，一次写入会递增两次。
+    条件按当前列生成，之后为商品表新增列的迁移需再次调用本函数。
+    """
+    derived = {'unit_price_discounted', 'amount', 'amount_discounted', 'receivable', 'balance'}
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(products)") if row[1] not in derived]
+    changed = ' OR '.join(f"OLD.{col} IS NOT NEW.{col}" for col in columns)
+    connection.execute("DROP TRIGGER IF EXISTS trg_products_version_update")
+    connection.execute(f'''
+        CREATE TRIGGER trg_products_version_update
+        AFTER UPDATE ON products
+        WHEN {changed}
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'products';
+        END
+    ''')
+
+
+def _v10_version_skip_derived(connection):
+    """派生金额重算不再递增商品表变更计数（新增/修改各只计一次）"""
+    _create_products_version_update_trigger(connection)
+
+
+def _v11_image_task_claims(connection):
+    """图片任务认领：处理前原子地置为 running 并记录认领者，多进程不重复处理；认领超时视为认领者已退出"""
+    _add_missing_columns(connection, 'image_tasks', {'owner': 'TEXT', 'claimed_at': 'TEXT'})
+    connection.execute("DROP INDEX IF EXISTS idx_image_tasks_pending")
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_image_tasks_open ON image_tasks(kind, id) "
+        "WHERE status IN ('pending', 'running')"
+    )
+
+
+# 有序迁移列表: (版本号, 说明, 迁移函数)
+MIGRATIONS = [
+    (1, '基础表结构', _v1_baseline),
+    (2, '列表查询索引', _v2_list_indexes),
+    (3, '派生金额列落库', _v3_derived_amounts),
+    (4, 'WAL日志模式', _v4_wal_journal),
+    (5, '软删除标记', _v5_soft_delete),
+    (6, '表级变更计数', _v6_table_versions),
+    (7, '图片后台任务', _v7_image_tasks),
+    (8, '图片引用索引', _v8_image_path_index),
+    (9, '图片元数据', _v9_image_meta),
+    (10, '派生列重算不计数', _v10_version_skip_derived),
+    (11, '图片任务认领', _v11_image_task_claims),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def migrate():
+    """将数据库升级到最新版本，返回当前版本号"""
+    connection = db_manager.get_connection()
+    try:
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return version
+
+        # 手动管理事务；每个迁移与版本号在同一事务内提交
+        connection.isolation_level = None
+        for target, title, func in MIGRATIONS:
+            if target <= version:
+                continue
+            outside = getattr(func, 'outside_transaction', False)
+            if outside:
+                func(connection)
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # 持锁后重新读取，其他进程可能已完成该迁移
+                version = connection.execute("PRAGMA user_version").fetchone()[0]
+                if target <= version:
+                    connection.execute("COMMIT")
+                    continue
+                if not outside:
+                    func(connection)
+                connection.execute(f"PRAGMA user_version = {int(target)}")
+                connection.execute("COMMIT")
+                version = target
+                logger.info(f"数据库迁移完成: v{target} {title}")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return SCHEMA_VERSION
+    finally:
+        connection.close()
@@ -3,8 +3,39 @@
 商品数据模型
 """
 
+from contextlib import nullcontext
 from datetime import datetime
 from models.database import db_manager
+from models.archive import product_archive
+from utils.cache import VersionedLRUCache
+
+# 列表总数缓存：(筛选条件, 参数, 是否近似) -> (数据版本, 总数)
+COUNT_CACHE_SIZE = 128
+# 近似总数的统计上限
+APPROX_COUNT_CAP = 10000
+# IN (...) 查询单批ID数量（低于 SQLite 变量数上限）
+BATCH_ID_CHUNK = 500
+
+# 汇总维度: 维度名 -> SQL 表达式
+REPORT_DIMENSIONS = {
+    'customer': "COALESCE(customer_name, name)",
+    'salesperson': "COALESCE(salesperson, '')",
+    'month': "substr(COALESCE(doc_date, substr(create_time,1,10)), 1, 7)",
+    'settlement_account': "COALESCE(settlement_account, '')",
+}
+# 汇总指标: 指标名 -> 聚合表达式（派生金额列由数据库维护，可直接求和）
+REPORT_METRICS = {
+    'quantity': "COALESCE(SUM(quantity), 0)",
+    'amount': "ROUND(TOTAL(amount), 2)",
+    'receivable': "ROUND(TOTAL(receivable), 2)",
+    'paid_total': "ROUND(TOTAL(paid_total), 2)",
+    'balance': "ROUND(TOTAL(balance), 2)",
+}
+
+_count_cache = VersionedLRUCache(COUNT_CACHE_SIZE)
+
+# 随 image_path 一起保存的图片元数据字段（上传时由 FileHandler 提供）
+IMAGE_META_FIELDS = ('image_width', 'image_height', 'image_bytes', 'image_format', 'image_hash')
 
 class Product:
     """商品模型类"""
@@ -31,7 +62,13 @@ class Product:
                  settlement_account=None,       # 结算账户
                  description=None,              # 说明
                  salesperson=None,              # 营业员
-                 update_time=None               # 修改时间
+                 update_time=None,              # 修改时间
+                 deleted_at=None,               # 删除时间（软删除）
+                 image_width=None,              # 图片宽（像素）
+                 image_height=None,             # 图片高（像素）
+                 image_bytes=None,              # 图片文件大小
+                 image_format=None,             # 图片格式（JPEG/PNG）
+                 image_hash=None                # 图片内容哈希（sha256）
                  ):
         self.id = id
         self.name = name
@@ -62,57 +99,26 @@ class Product:
         self.description = description
         self.salesperson = salesperson
         self.update_time = update_time
+        self.deleted_at = deleted_at
+        self.image_width = image_width
+        self.image_height = image_height
+        self.image_bytes = image_bytes
+        self.image_format = image_format
+        self.image_hash = image_hash
     
     @classmethod
     def create_table(cls):
-        """创建/升级商品表（仅新增字段，不改变既有写入逻辑）"""
-        sql = '''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                price REAL NOT NULL,
-                quantity INTEGER NOT NULL,
-                spec TEXT,
-                image_path TEXT,
-                create_time TEXT DEFAULT (datetime('now','+8 hours'))
-            )
-        '''
-        db_manager.execute_update(sql)
-        # 自动补齐新增列
-        cls._ensure_columns()
+        """创建/升级商品表（由版本化迁移统一完成）"""
+        from models.migrations import migrate
+        migrate()
         return True
 
-    @classmethod
-    def _ensure_columns(cls):
-        """为已存在表补齐缺失列（只做 ADD COLUMN）"""
-        # 期望列: 列名 -> SQL 片段
-        expected = {
-            'doc_date': "TEXT DEFAULT (date('now','+8 hours'))",
-            'customer_name': "TEXT",
-            'product_desc': "TEXT",
-            'unit': "TEXT",
-            'unit_price': "REAL",
-            'unit_discount_rate': "REAL DEFAULT 100",
-            'unit_price_discounted': "REAL",
-            'amount': "REAL",
-            'remark': "TEXT",
-            'freight': "REAL DEFAULT 0",
-            'order_discount_rate': "REAL DEFAULT 100",
-            'amount_discounted': "REAL",
-            'receivable': "REAL",
-            'payment_current': "REAL DEFAULT 0",
-            'paid_total': "REAL DEFAULT 0",
-            'balance': "REAL",
-            'settlement_account': "TEXT",
-            'description': "TEXT",
-            'salesperson': "TEXT",
-            'update_time': "TEXT DEFAULT (datetime('now','+8 hours'))"
-        }
-        cols = db_manager.execute_query("PRAGMA table_info(products)")
-        have = {c['name'] for c in cols} if cols else set()
-        for col, ddl in expected.items():
-            if col not in have:
-                db_manager.execute_update(f"ALTER TABLE products ADD COLUMN {col} {ddl}")
+    def set_image(self, image_path, meta=None):
+        """设置图片及其元数据；image_path 为 None 时一并清空"""
+        self.image_path = image_path
+        meta = meta if image_path else None
+        for field in IMAGE_META_FIELDS:
+            setattr(self, field, (meta or {}).get(field))
 
     def save(self):
         """保存商品到数据库"""
@@ -121,6 +127,7 @@ class Product:
             sql = '''
                 UPDATE products 
                 SET name=?, price=?, quantity=?, spec=?, image_path=?,
+                    image_width=?, image_height=?, image_bytes=?, image_format=?, image_hash=?,
                     doc_date=?, customer_name=?, product_desc=?, unit=?, unit_price=?,
                     remark=?, settlement_account=?, description=?, salesperson=?, freight=?, paid_total=?,
                     update_time=datetime('now','+8 hours')
@@ -132,6 +139,11 @@ class Product:
                 self.quantity,
                 self.spec,
                 self.image_path,
+                self.image_width,
+                self.image_height,
+                self.image_bytes,
+                self.image_format,
+                self.image_hash,
                 self.doc_date,
                 (self.customer_name or self.name),
                 self.product_desc,
@@ -148,51 +160,77 @@ class Product:
             return db_manager.execute_update(sql, params)
         else:
             # 插入（保持原有字段集合，不动业务逻辑）
-            sql = '''
-                INSERT INTO products (
-                    name, price, quantity, spec, image_path,
-                    doc_date, customer_name, product_desc, unit, unit_price,
-                    remark, settlement_account, description, salesperson, freight, paid_total,
-                    update_time
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now','+8 hours'))
-            '''
-            params = (
-                self.name,
-                self.price,
-                self.quantity,
-                self.spec,
-                self.image_path,
-                self.doc_date,
-                (self.customer_name or self.name),
-                self.product_desc,
-                (self.unit or self.spec),
-                (self.unit_price if self.unit_price is not None else self.price),
-                self.remark,
-                self.settlement_account,
-                self.description,
-                self.salesperson,
-                self.freight,
-                self.paid_total
-            )
-            self.id = db_manager.execute_insert(sql, params)
+            self.id = db_manager.execute_insert(self.INSERT_SQL, self._insert_params())
             return self.id
+
+    # 插入语句（单条保存与批量导入共用）
+    INSERT_SQL = '''
+        INSERT INTO products (
+            name, price, quantity, spec, image_path,
+            image_width, image_height, image_bytes, image_format, image_hash,
+            doc_date, customer_name, product_desc, unit, unit_price,
+            remark, settlement_account, description, salesperson, freight, paid_total,
+            unit_discount_rate, order_discount_rate,
+            update_time
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+                COALESCE(?, 100), COALESCE(?, 100), datetime('now','+8 hours'))
+    '''
+
+    def _insert_params(self):
+        """INSERT_SQL 对应的参数"""
+        return (
+            self.name,
+            self.price,
+            self.quantity,
+            self.spec,
+            self.image_path,
+            self.image_width,
+            self.image_height,
+            self.image_bytes,
+            self.image_format,
+            self.image_hash,
+            self.doc_date,
+            (self.customer_name or self.name),
+            self.product_desc,
+            (self.unit or self.spec),
+            (self.unit_price if self.unit_price is not None else self.price),
+            self.remark,
+            self.settlement_account,
+            self.description,
+            self.salesperson,
+            self.freight,
+            self.paid_total,
+            self.unit_discount_rate,
+            self.order_discount_rate
+        )
+
+    @classmethod
+    def bulk_insert(cls, products):
+        """在单个事务中批量插入商品，返回插入条数"""
+        if not products:
+            return 0
+        return db_manager.execute_many(cls.INSERT_SQL, [p._insert_params() for p in products])
     
     @classmethod
     def find_by_id(cls, product_id):
-        """根据ID查找商品"""
-        sql = "SELECT * FROM products WHERE id = ?"
+        """根据ID查找商品（已软删除的视为不存在）"""
+        sql = "SELECT * FROM products WHERE id = ? AND deleted_at IS NULL"
         result = db_manager.execute_query(sql, (product_id,))
         if result:
             return cls(**result[0])
         return None
     
     @classmethod
-    def find_all(cls, page=1, per_page=10, search=None, product_desc=None, salesperson=None, date_start=None, date_end=None):
-        """查找所有商品，支持分页和搜索"""
-        offset = (page - 1) * per_page
-        
-        where_parts = []
+    def data_version(cls):
+        """商品表变更计数（任意进程增删改后递增），用于缓存失效与 ETag"""
+        return db_manager.table_version('products')
+
+    @classmethod
+    def _build_where(cls, search=None, product_desc=None, salesperson=None, date_start=None, date_end=None):
+        """根据筛选条件构造 WHERE 子句与参数"""
+        # 已软删除的数据对所有读取路径不可见
+        where_parts = ["deleted_at IS NULL"]
         params = []
         # 客户名称模糊（历史保存在 name 列）
         if search:
@@ -215,35 +253,298 @@ class Product:
             where_parts.append(f"{coalesce_date} <= ?")
             params.append(date_end)
 
-        where_clause = ("WHERE " + " AND ".join(where_parts)) if where_parts else ""
-        
-        count_sql = f"SELECT COUNT(*) as total FROM products {where_clause}"
-        count_result = db_manager.execute_query(count_sql, params)
-        total = count_result[0]['total'] if count_result else 0
-        
-        data_sql = f'''
-            SELECT * FROM products {where_clause}
-            ORDER BY create_time DESC
-            LIMIT ? OFFSET ?
-        '''
-        params.extend([per_page, offset])
-        products_data = db_manager.execute_query(data_sql, params)
-        
-        products = [cls(**data) for data in products_data]
+        where_clause = "WHERE " + " AND ".join(where_parts)
+        return where_clause, params
+
+    @classmethod
+    def list_fields(cls, fields):
+        """校验列表投影字段：按表中列顺序排列并去重，id 始终在首位；含未知字段时抛出 ValueError
+
+        顺序与请求无关，同一字段集合只对应一种记录类型。
+        """
+        columns = product_archive.main_columns()
+        unknown = [f for f in fields if f not in columns]
+        if unknown:
+            raise ValueError(f"未知字段: {', '.join(unknown)}")
+        wanted = set(fields)
+        return ('id',) + tuple(c for c in columns if c in wanted and c != 'id')
+
+    @classmethod
+    def find_all(cls, page=1, per_page=10, search=None, product_desc=None, salesperson=None, date_start=None, date_end=None,
+                 approximate=False, readonly=False, fields=None):
+        """查找所有商品，支持分页和搜索
+
+        总数优先取自按筛选条件缓存的结果（商品表任何写入都会使其失效），
+        未命中时在分页查询中用 COUNT(*) OVER () 一并取得，避免单独再扫一遍。
+        approximate=True 时总数最多统计到 APPROX_COUNT_CAP 条，适合范围很宽的筛选。
+        products 为只读的紧凑记录（namedtuple，支持属性访问、.get 与 to_dict），
+        需要修改保存时请用 find_by_id 取得 Product 对象。
+        readonly=True 时在只读快照（db_manager.snapshot）上查询（导出等长查询使用，不阻塞写入）。
+        fields 为经 list_fields 校验的投影字段，只查询这些列；为空时查询全部列。
+        每条记录另带 archived 列：1 表示已迁入归档库的行（只读，不能修改或删除）。
+        """
+        offset = (page - 1) * per_page
+        where_clause, params = cls._build_where(search, product_desc, salesperson, date_start, date_end)
+        # 日期范围涉及归档年份时，附加对应归档库一并查询
+        source, attach = product_archive.source(date_start, date_end)
+        # 每行带 archived 标记（归档行只读）：归档子查询自带该列，只查主库时恒为 0
+        if attach:
+            select_list = f"{', '.join(fields)}, archived" if fields else '*'
+        else:
+            select_list = f"{', '.join(fields) if fields else '*'}, 0 AS archived"
+
+        cache_key = (source, where_clause, tuple(params), bool(approximate))
+        version = cls.data_version()
+        total = _count_cache.get(cache_key, version)
+        total_approximate = False
+
+        # 只读查询在同一快照内执行，分页数据与单独统计的总数一致
+        with (db_manager.snapshot(attach) if readonly else nullcontext()) as connection:
+            if total is None and not approximate:
+                # 总数与分页数据同一条语句返回（_total 为末列，不进入 to_dict）
+                data_sql = f'''
+                    SELECT {select_list}, COUNT(*) OVER () AS _total FROM {source} {where_clause}
+                    ORDER BY create_time DESC
+                    LIMIT ? OFFSET ?
+                '''
+                products = db_manager.execute_query_records(data_sql, params + [per_page, offset], 'ProductRecord',
+                                                            readonly=readonly, attach=attach, connection=connection)
+                if products:
+                    total = products[0][-1]
+                elif offset == 0:
+                    total = 0
+                else:
+                    # 页码越界时窗口函数拿不到总数，单独统计
+                    total = cls._count(where_clause, params, readonly=readonly, source=source, attach=attach,
+                                       connection=connection)
+                _count_cache.set(cache_key, version, total)
+            else:
+                data_sql = f'''
+                    SELECT {select_list} FROM {source} {where_clause}
+                    ORDER BY create_time DESC
+                    LIMIT ? OFFSET ?
+                '''
+                products = db_manager.execute_query_records(data_sql, params + [per_page, offset], 'ProductRecord',
+                                                            readonly=readonly, attach=attach, connection=connection)
+                if total is None:
+                    total = cls._count(where_clause, params, limit=APPROX_COUNT_CAP + 1, readonly=readonly,
+                                       source=source, attach=attach, connection=connection)
+                    _count_cache.set(cache_key, version, total)
+        if approximate and total > APPROX_COUNT_CAP:
+            total = APPROX_COUNT_CAP
+            total_approximate = True
+
         return {
             'products': products,
             'total': total,
+            'total_approximate': total_approximate,
             'page': page,
             'per_page': per_page,
             'total_pages': (total + per_page - 1) // per_page
         }
+
+    @classmethod
+    def to_columnar(cls, records, fields=None):
+        """find_all 记录转为按列结构：{'fields': [...], 'columns': {字段: [值...]}, 'row_count': n}"""
+        if records:
+            names = records[0]._public_fields
+            index = records[0]._index
+            values = list(zip(*records))
+            columns = {name: list(values[index[name]]) for name in names}
+        else:
+            names = fields or tuple(product_archive.main_columns())
+            columns = {name: [] for name in names}
+        return {'fields': list(names), 'columns': columns, 'row_count': len(records)}
+
+    @classmethod
+    def _count(cls, where_clause, params, limit=None, readonly=False, source='products', attach=None, connection=None):
+        """统计满足条件的行数；指定 limit 时最多统计 limit 行"""
+        if limit:
+            count_sql = f"SELECT COUNT(*) as total FROM (SELECT 1 FROM {source} {where_clause} LIMIT ?)"
+            count_result = db_manager.execute_query(count_sql, list(params) + [limit], readonly=readonly, attach=attach,
+                                                    connection=connection)
+        else:
+            count_sql = f"SELECT COUNT(*) as total FROM {source} {where_clause}"
+            count_result = db_manager.execute_query(count_sql, params, readonly=readonly, attach=attach,
+                                                    connection=connection)
+        return count_result[0]['total'] if count_result else 0
     
+    @classmethod
+    def aggregate(cls, group_by, search=None, product_desc=None, salesperson=None, date_start=None, date_end=None):
+        """按维度汇总（筛选条件与 find_all 一致），在只读快照连接上执行
+        group_by: REPORT_DIMENSIONS 中的维度列表，如 ['month', 'salesperson']
+        返回 {'rows': [...], 'totals': {...}}
+        """
+        where_clause, params = cls._build_where(search, product_desc, salesperson, date_start, date_end)
+        source, attach = product_archive.source(date_start, date_end)
+        dims = [f"{REPORT_DIMENSIONS[d]} AS {d}" for d in group_by]
+        metrics = ", ".join(f"{expr} AS {m}" for m, expr in REPORT_METRICS.items())
+        sql = f'''
+            SELECT {', '.join(dims)}, COUNT(*) AS line_count, {metrics}
+            FROM {source} {where_clause}
+            GROUP BY {', '.join(str(i) for i in range(1, len(dims) + 1))}
+            ORDER BY {', '.join(str(i) for i in range(1, len(dims) + 1))}
+        '''
+        totals_sql = f"SELECT COUNT(*) AS line_count, {metrics} FROM {source} {where_clause}"
+        # 明细与合计在同一快照内查询，期间的写入不会造成两者不一致
+        with db_manager.snapshot(attach) as connection:
+            rows = db_manager.execute_query(sql, params, connection=connection)
+            totals = db_manager.execute_query(totals_sql, params, connection=connection)
+        return {'rows': rows, 'totals': totals[0] if totals else {}}
+
+    @classmethod
+    def batch_update_fields(cls, updates):
+        """在一个事务内批量更新部分字段
+        updates: List[(id, {列名: 值})]，列名须由调用方校验
+        按更新列集合分组，每组一次 executemany；返回与 updates 对齐的错误列表（None 表示成功）
+        """
+        errors = [None] * len(updates)
+        if not updates:
+            return errors
+
+        with db_manager.transaction() as connection:
+            # 同一事务内确认存在的ID，代替逐行检查 rowcount
+            ids = list({pid for pid, _ in updates})
+            existing = set()
+            for i in range(0, len(ids), BATCH_ID_CHUNK):
+                chunk = ids[i:i + BATCH_ID_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = connection.execute(
+                    f"SELECT id FROM products WHERE id IN ({placeholders}) AND deleted_at IS NULL", chunk
+                )
+                existing.update(r[0] for r in rows)
+
+            # 按列集合分组
+            groups = {}
+            for idx, (pid, fields) in enumerate(updates):
+                if pid not in existing:
+                    errors[idx] = '未找到或未更新'
+                    continue
+                columns = tuple(sorted(fields))
+                groups.setdefault(columns, []).append(idx)
+
+            for columns, indexes in groups.items():
+                set_parts = [f"{c}=?" for c in columns]
+                # 自动更新 update_time
+                set_parts.append("update_time=datetime('now','+8 hours')")
+                sql = f"UPDATE products SET {', '.join(set_parts)} WHERE id=?"
+                rows = [tuple(updates[i][1][c] for c in columns) + (updates[i][0],) for i in indexes]
+                connection.execute("SAVEPOINT batch_group")
+                try:
+                    connection.executemany(sql, rows)
+                    connection.execute("RELEASE batch_group")
+                except Exception:
+                    # 整组失败时回退该组，再逐行执行以定位出错的条目
+                    connection.execute("ROLLBACK TO batch_group")
+                    connection.execute("RELEASE batch_group")
+                    for i, params in zip(indexes, rows):
+                        try:
+                            connection.execute(sql, params)
+                        except Exception as e:
+                            errors[i] = str(e)
+        return errors
+
+    @classmethod
+    def batch_set_images(cls, updates):
+        """在一个事务内批量设置商品图片及其元数据
+        updates: List[(id, image_path, meta)]，id 不重复
+        返回 (错误列表, 原图片路径列表)，均与 updates 对齐；错误为 None 表示成功
+        """
+        errors = [None] * len(updates)
+        old_paths = [None] * len(updates)
+        if not updates:
+            return errors, old_paths
+
+        with db_manager.transaction() as connection:
+            # 同一事务内读取原图片路径，写入后由调用方释放
+            ids = [pid for pid, _, _ in updates]
+            current = {}
+            for i in range(0, len(ids), BATCH_ID_CHUNK):
+                chunk = ids[i:i + BATCH_ID_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = connection.execute(
+                    f"SELECT id, image_path FROM products WHERE id IN ({placeholders}) AND deleted_at IS NULL", chunk
+                )
+                current.update((r[0], r[1]) for r in rows)
+
+            rows = []
+            for idx, (pid, image_path, meta) in enumerate(updates):
+                if pid not in current:
+                    errors[idx] = '商品不存在'
+                    continue
+                old_paths[idx] = current[pid]
+                meta = meta or {}
+                rows.append((image_path,) + tuple(meta.get(f) for f in IMAGE_META_FIELDS) + (pid,))
+            set_parts = ', '.join(f"{c}=?" for c in ('image_path',) + IMAGE_META_FIELDS)
+            connection.executemany(
+                f"UPDATE products SET {set_parts}, update_time=datetime('now','+8 hours') WHERE id=?", rows
+            )
+        return errors, old_paths
+
     def delete(self):
-        """删除商品"""
+        """删除商品（软删除，后台任务到期后物理删除）"""
         if self.id:
-            sql = "DELETE FROM products WHERE id = ?"
-            return db_manager.execute_update(sql, (self.id,))
+            return self.soft_delete([self.id])
         return False
+
+    @classmethod
+    def soft_delete(cls, ids):
+        """批量标记删除，返回实际标记的条数"""
+        return cls._update_by_ids(
+            "UPDATE products SET deleted_at = datetime('now','+8 hours') "
+            "WHERE id IN ({placeholders}) AND deleted_at IS NULL", ids
+        )
+
+    @classmethod
+    def restore(cls, ids):
+        """撤销删除（尚未被清理的数据），返回恢复的条数"""
+        return cls._update_by_ids(
+            "UPDATE products SET deleted_at = NULL WHERE id IN ({placeholders}) AND deleted_at IS NOT NULL", ids
+        )
+
+    @classmethod
+    def _update_by_ids(cls, sql, ids):
+        """按 BATCH_ID_CHUNK 分块执行带 IN ({placeholders}) 的更新（同一事务），返回影响的总行数"""
+        ids = list(ids)
+        if not ids:
+            return 0
+        affected = 0
+        with db_manager.transaction() as connection:
+            for i in range(0, len(ids), BATCH_ID_CHUNK):
+                chunk = ids[i:i + BATCH_ID_CHUNK]
+                cursor = connection.execute(sql.format(placeholders=','.join('?' * len(chunk))), chunk)
+                affected += cursor.rowcount
+        return affected
+
+    @classmethod
+    def purge_deleted(cls, older_than_hours, limit):
+        """物理删除超过保留期的已删除数据（单批），返回被删除行的 (id, image_path) 列表"""
+        with db_manager.transaction() as connection:
+            rows = connection.execute(
+                "SELECT id, image_path FROM products "
+                "WHERE deleted_at IS NOT NULL AND deleted_at <= datetime('now','+8 hours', ?) "
+                "ORDER BY deleted_at LIMIT ?",
+                (f'-{float(older_than_hours)} hours', int(limit))
+            ).fetchall()
+            if rows:
+                connection.executemany("DELETE FROM products WHERE id = ?", [(r[0],) for r in rows])
+            return rows
+    
+    @classmethod
+    def unreferenced_images(cls, image_paths):
+        """返回已不被任何商品引用的图片（已删除未清理、已归档的数据仍算引用）"""
+        candidates = {p for p in image_paths if p}
+        if not candidates:
+            return []
+        placeholders = ', '.join('?' * len(candidates))
+        rows = db_manager.execute_query(
+            f"SELECT DISTINCT image_path FROM products WHERE image_path IN ({placeholders})",
+            tuple(candidates)
+        )
+        candidates -= {r['image_path'] for r in rows}
+        if candidates:
+            candidates -= product_archive.referenced_images(candidates)
+        return sorted(candidates)
     
     def to_dict(self):
         """转换为字典格式（包含新增字段）"""
@@ -275,5 +576,11 @@ class Product:
             'settlement_account': self.settlement_account,
             'description': self.description,
             'salesperson': self.salesperson,
-            'update_time': self.update_time
+            'update_time': self.update_time,
+            'deleted_at': self.deleted_at,
+            'image_width': self.image_width,
+            'image_height': self.image_height,
+            'image_bytes': self.image_bytes,
+            'image_format': self.image_format,
+            'image_hash': self.image_hash
         }
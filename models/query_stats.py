@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+SQL 执行统计：按 (调用方标签, 语句) 聚合耗时直方图，慢查询单独记录
+
+统计保存在进程内存中；多进程部署时每个 worker 各自统计。
+"""
+
+import os
+import re
+import threading
+
+# 慢查询阈值（毫秒）
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+# 直方图桶上界（毫秒），最后一个桶为 +inf
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+# 最多保留的语句数，防止动态 SQL 撑爆内存
+MAX_STATEMENTS = 500
+
+_whitespace = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """压缩空白，作为语句聚合键"""
+    return _whitespace.sub(' ', sql).strip()
+
+
+class QueryStats:
+    """SQL 耗时统计"""
+
+    def __init__(self, slow_threshold_ms=SLOW_QUERY_MS):
+        self.slow_threshold_ms = slow_threshold_ms
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, label, sql, elapsed_ms, rows=None):
+        """记录一次执行"""
+        key = (label, normalize_sql(sql))
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= MAX_STATEMENTS:
+                    return
+                entry = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'slow_count': 0,
+                    'buckets': [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+                }
+                self._stats[key] = entry
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['rows'] += rows or 0
+            if elapsed_ms >= self.slow_threshold_ms:
+                entry['slow_count'] += 1
+            for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    entry['buckets'][i] += 1
+                    break
+            else:
+                entry['buckets'][-1] += 1
+
+    def is_slow(self, elapsed_ms):
+        return elapsed_ms >= self.slow_threshold_ms
+
+    def snapshot(self):
+        """导出当前统计，按累计耗时降序"""
+        with self._lock:
+            items = [(k, dict(v, buckets=list(v['buckets']))) for k, v in self._stats.items()]
+        result = []
+        for (label, sql), v in items:
+            labels = [f"<={b}ms" for b in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+            result.append({
+                'label': label,
+                'sql': sql,
+                'count': v['count'],
+                'total_ms': round(v['total_ms'], 3),
+                'avg_ms': round(v['total_ms'] / v['count'], 3) if v['count'] else 0,
+                'max_ms': round(v['max_ms'], 3),
+                'rows': v['rows'],
+                'slow_count': v['slow_count'],
+                'histogram': dict(zip(labels, v['buckets']))
+            })
+        result.sort(key=lambda x: x['total_ms'], reverse=True)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# 全局统计实例
+query_stats = QueryStats()
@@ -21,25 +21,9 @@ class User:
 
     @classmethod
     def create_table(cls):
-        sql = '''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL UNIQUE,
-                password_hash TEXT NOT NULL,
-                is_admin INTEGER DEFAULT 0,
-                real_name TEXT,
-                create_time TEXT DEFAULT (datetime('now'))
-            )
-        '''
-        db_manager.execute_update(sql)
-        # 兼容旧库：若缺少 real_name 列则新增
-        try:
-            cols = db_manager.execute_query("PRAGMA table_info(users)")
-            col_names = [c.get('name') for c in cols]
-            if 'real_name' not in col_names:
-                db_manager.execute_update("ALTER TABLE users ADD COLUMN real_name TEXT")
-        except Exception:
-            pass
+        """创建/升级用户表（由版本化迁移统一完成）"""
+        from models.migrations import migrate
+        migrate()
         return True
 
     @classmethod
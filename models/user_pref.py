@@ -4,6 +4,10 @@
 """
 
 from models.database import db_manager
+from utils.cache import VersionedLRUCache
+
+# 偏好缓存条目数：(用户ID, 键) -> (数据版本, (值,))
+PREF_CACHE_SIZE = 1024
 
 
 class UserPreference:
@@ -11,30 +15,40 @@ class UserPreference:
 
     @classmethod
     def create_table(cls):
-        sql = '''
-            CREATE TABLE IF NOT EXISTS user_preferences (
-                user_id INTEGER NOT NULL,
-                pref_key TEXT NOT NULL,
-                pref_value TEXT,
-                PRIMARY KEY (user_id, pref_key)
-            )
-        '''
-        db_manager.execute_update(sql)
+        """创建偏好表（由版本化迁移统一完成）"""
+        from models.migrations import migrate
+        migrate()
         return True
 
+    @classmethod
+    def data_version(cls):
+        """偏好表变更计数（任意进程写入后递增）"""
+        return db_manager.table_version('user_preferences')
+
+    # 进程内偏好缓存；任意进程写入偏好表后变更计数递增，缓存随之失效
+    _cache = VersionedLRUCache(PREF_CACHE_SIZE)
+
     @classmethod
     def get_pref(cls, user_id: int, key: str):
+        version = cls.data_version()
+        cached = cls._cache.get((user_id, key), version)
+        if cached is not None:
+            return cached[0]
         rows = db_manager.execute_query('SELECT pref_value FROM user_preferences WHERE user_id=? AND pref_key=?', (user_id, key))
-        if rows:
-            return rows[0].get('pref_value')
-        return None
+        value = rows[0].get('pref_value') if rows else None
+        # 值包一层元组，未设置（None）也能缓存
+        cls._cache.set((user_id, key), version, (value,))
+        return value
 
     @classmethod
     def set_pref(cls, user_id: int, key: str, value: str):
-        exists = db_manager.execute_query('SELECT 1 FROM user_preferences WHERE user_id=? AND pref_key=?', (user_id, key))
-        if exists:
-            return db_manager.execute_update('UPDATE user_preferences SET pref_value=? WHERE user_id=? AND pref_key=?', (value, user_id, key))
-        else:
-            return db_manager.execute_update('INSERT INTO user_preferences (user_id, pref_key, pref_value) VALUES (?, ?, ?)', (user_id, key, value))
-
-
+        """单条 UPSERT 写入，并以同一事务内的变更计数写入缓存（write-through）"""
+        with db_manager.transaction() as connection:
+            cursor = connection.execute(
+                'INSERT INTO user_preferences (user_id, pref_key, pref_value) VALUES (?, ?, ?) '
+                'ON CONFLICT(user_id, pref_key) DO UPDATE SET pref_value=excluded.pref_value',
+                (user_id, key, value)
+            )
+            row = connection.execute("SELECT version FROM table_versions WHERE name = 'user_preferences'").fetchone()
+        cls._cache.set((user_id, key), row[0] if row else 0, (value,))
+        return cursor.rowcount
@@ -4,9 +4,10 @@
 启动MVC架构的商品管理系统
 """
 
-from app_mvc import app
+from app_mvc import app, start_background_services
 
 if __name__ == '__main__':
+    start_background_services()
     app.run(
         debug=True,
         host='0.0.0.0',
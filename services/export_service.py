@@ -20,15 +20,60 @@ from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 from PIL import Image
 
+from utils.cache import VersionedLRUCache
+from utils.file_handler import FileHandler
+from utils.upload_index import upload_index
+from config import Config
+
 # 使用主应用的日志配置
 from logging_config import get_logger
 logger = get_logger(__name__)
 
+# 图片显示框（像素）：默认行高 120 磅约 160 像素，图片列宽 50 字符约 355 像素
+EXPORT_IMAGE_MAX_WIDTH_PX = 340
+EXPORT_IMAGE_MAX_HEIGHT_PX = 150
+# 无元数据的历史图片沿用的固定行高（磅）
+LEGACY_IMAGE_ROW_HEIGHT = 120
+
+# 导出结果缓存条数（按筛选条件 + 列设置，商品表变化即失效；总字节数另受 Config.EXPORT_CACHE_MAX_BYTES 限制）
+EXPORT_CACHE_SIZE = 4
+
+# 导出列 -> 表头显示名（导入时按同一映射反查列）
+COLUMN_DISPLAY_NAMES = {
+    'doc_date': '单据日期',
+    'customer_name': '客户名称',
+    'product_desc': '品名规格',
+    'unit': '单位',
+    'quantity': '数量',
+    'unit_price': '单价',
+    'unit_discount_rate': '单价折扣率(%)',
+    'unit_price_discounted': '折后单价',
+    'amount': '金额',
+    'image': '图片',
+    'remark': '备注',
+    'freight': '运费',
+    'order_discount_rate': '整单折扣率(%)',
+    'amount_discounted': '折后金额',
+    'receivable': '应收款',
+    'paid_total': '已收款',
+    'balance': '尾款',
+    'settlement_account': '结算账户',
+    'description': '说明',
+    'salesperson': '营业员',
+    'update_time': '修改时间',
+    'create_time': '创建时间'
+}
+
+# 数据库中落库维护的派生金额列（旧数据缺值时仍按下方公式计算）
+STORED_AMOUNT_COLUMNS = {'unit_price_discounted', 'amount', 'amount_discounted', 'receivable', 'balance'}
+
 class ExportService:
     """导出服务类"""
 
     def __init__(self):
         self.template_path = 'templates/product_template.xlsm'
+        self.result_cache = VersionedLRUCache(EXPORT_CACHE_SIZE, max_bytes=Config.EXPORT_CACHE_MAX_BYTES)
+        self.file_handler = FileHandler()
 
     def export_to_excel(self, products_data, selected_columns):
         """导出商品数据"""
@@ -44,6 +89,10 @@ class ExportService:
             logger.info(f"模板路径: {self.template_path}")
             logger.info(f"模板文件存在: {os.path.exists(self.template_path)}")
             
+            # 上传文件索引按目录 mtime 校验（距上次不足 UPLOAD_INDEX_TTL 时跳过），逐行查找图片不再访问文件系统；
+            # 未命中的图片再单独校验其分片目录（见 _resolve_image_path）
+            upload_index.refresh()
+
             # 0. 规范化列名（将 image_path 等同于 image）
             logger.info(f"\n📋 步骤1: 规范化列名")
             normalized_columns = self._normalize_columns(selected_columns)
@@ -188,9 +237,11 @@ class ExportService:
                     if column == 'image':
                         # 图片列：插入实际图片
                         logger.info(f"处理第{row_idx}行图片列，图片路径: {product.get('image_path', '')}")
-                        self._insert_image_to_cell(worksheet, row_idx, col_idx, product.get('image_path', ''))
-                        # 设置行高以适应原图（设置更大的行高）
-                        worksheet.row_dimensions[row_idx].height = 120
+                        row_height = self._insert_image_to_cell(worksheet, row_idx, col_idx,
+                                                                product.get('image_path', ''), product)
+                        # 行高按图片显示尺寸设置；没有图片的行保持默认行高
+                        if row_height:
+                            worksheet.row_dimensions[row_idx].height = row_height
                     else:
                         # 其他列：写入文本值
                         cell = worksheet.cell(row=row_idx, column=col_idx)
@@ -259,51 +310,52 @@ class ExportService:
         return normalized
 
     def _resolve_image_path(self, image_filename: str) -> str:
-        """尽量解析图片的绝对路径。"""
+        """解析图片的绝对路径：按上传文件索引查找，不存在返回空串
+
+        命中时只查内存；未命中时校验该图片所在的分片目录，其他 worker 刚上传的图片也能找到
+        （导出结果会被缓存，不能缺图）。
+        """
         if not image_filename:
             return ''
 
         # 已是绝对路径
-        if os.path.isabs(image_filename) and os.path.exists(image_filename):
-            return image_filename
-
-        candidates = []
-        # 工程根目录
-        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-        candidates.append(os.path.join(project_root, 'uploads', image_filename))
-        # 当前工作目录
-        candidates.append(os.path.join(os.getcwd(), 'uploads', image_filename))
-        # 直接相对路径
-        candidates.append(os.path.join('uploads', image_filename))
-        candidates.append(image_filename)
-
-        for p in candidates:
-            if os.path.exists(p):
-                return p
-        return ''
-
-    def _insert_image_to_cell(self, worksheet, row, col, image_path):
-        """在指定单元格插入图片"""
+        if os.path.isabs(image_filename):
+            return image_filename if os.path.exists(image_filename) else ''
+
+        return upload_index.resolve(image_filename, recheck=True)
+
+    def _insert_image_to_cell(self, worksheet, row, col, image_path, product=None):
+        """在指定单元格插入图片，返回该行所需行高（磅）；未插入返回 None
+
+        文件按上传索引查找，缺失时跳过；商品记录带有图片元数据时按记录的宽高计算显示尺寸与行高，
+        历史数据（无元数据）沿用固定行高。
+        """
         try:
             if not image_path:
-                logger.warning(f"图片路径为空")
-                return
-            # 解析为可用的绝对路径
-            full_image_path = self._resolve_image_path(image_path)
+                return None
+            width = product.get('image_width') if product is not None else None
+            height = product.get('image_height') if product is not None else None
+            # 已生成导出尺寸衍生图时优先使用，避免整张原图写入工作簿；原图不大于导出尺寸时直接用原图
+            use_variant = not (width and height) or max(width, height) > Config.IMAGE_VARIANTS['export'][0]
+            full_image_path = ((use_variant and self._resolve_image_path(self.file_handler.variant_name(image_path, 'export')))
+                               or self._resolve_image_path(image_path))
             if not full_image_path:
-                logger.warning(f"找不到图片文件: {image_path}")
-                return
+                logger.warning(f"找不到图片文件，已跳过: {image_path}")
+                return None
             logger.info(f"正在插入图片: {full_image_path}")
             
-            # 直接使用原图，不压缩
             # 将图片插入到Excel
             from openpyxl.drawing.image import Image as XLImage
             excel_img = XLImage(full_image_path)
-            
-            # 保持原图尺寸，不强制设置宽高
-            # 如果需要调整大小，可以在这里设置
-            # excel_img.width = 200  # 可以根据需要调整
-            # excel_img.height = 150
+
+            row_height = LEGACY_IMAGE_ROW_HEIGHT
+            if width and height:
+                # 按原图比例缩放到显示框内（导出衍生图与原图比例相同）
+                scale = min(EXPORT_IMAGE_MAX_WIDTH_PX / width, EXPORT_IMAGE_MAX_HEIGHT_PX / height, 1)
+                excel_img.width = max(1, round(width * scale))
+                excel_img.height = max(1, round(height * scale))
+                # 像素 -> 磅（96 DPI），上下留白
+                row_height = excel_img.height * 0.75 + 4
             
             # 将图片放置在单元格附近
             excel_img.anchor = f'{get_column_letter(col)}{row}'
@@ -314,11 +366,16 @@ class ExportService:
             # 不要在这里删除临时图片文件，让 openpyxl 在保存时处理
             # 我们将在整个导出完成后清理所有临时文件
             logger.info(f"✓ 图片已插入到单元格 {get_column_letter(col)}{row}")
+            return row_height
             
+        except FileNotFoundError:
+            logger.warning(f"图片文件缺失，已跳过: {image_path}")
+            return None
         except Exception as e:
             logger.error(f"插入图片失败: {str(e)}")
             import traceback
             traceback.print_exc()
+            return None
     
     def _cleanup_temp_files(self, temp_files):
         """清理临时文件"""
@@ -448,31 +505,7 @@ objExcel.Quit
                 worksheet.cell(row=row, column=col).value = None
 
     def _get_column_display_name(self, column):
-        mapping = {
-            'doc_date': '单据日期',
-            'customer_name': '客户名称',
-            'product_desc': '品名规格',
-            'unit': '单位',
-            'quantity': '数量',
-            'unit_price': '单价',
-            'unit_discount_rate': '单价折扣率(%)',
-            'unit_price_discounted': '折后单价',
-            'amount': '金额',
-            'image': '图片',
-            'remark': '备注',
-            'freight': '运费',
-            'order_discount_rate': '整单折扣率(%)',
-            'amount_discounted': '折后金额',
-            'receivable': '应收款',
-            'paid_total': '已收款',
-            'balance': '尾款',
-            'settlement_account': '结算账户',
-            'description': '说明',
-            'salesperson': '营业员',
-            'update_time': '修改时间',
-            'create_time': '创建时间'
-        }
-        return mapping.get(column, column)
+        return COLUMN_DISPLAY_NAMES.get(column, column)
 
     def _get_product_value(self, product, column):
         try:
@@ -491,6 +524,9 @@ objExcel.Quit
             paid_total = num(product.get('paid_total'))
             # payment_current 字段已移除
             # payment_current 已删除
+            # 派生金额列已由数据库维护，优先直接读取落库值
+            if column in STORED_AMOUNT_COLUMNS and product.get(column) is not None:
+                return f"{num(product.get(column)):.2f}"
             if column == 'doc_date':
                 return product.get('doc_date') or (product.get('create_time') or '')[:10]
             if column == 'customer_name':
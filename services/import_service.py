@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+商品批量导入服务
+支持 CSV 与 xlsx/xlsm，逐行流式读取，分批校验并以事务批量写入
+"""
+
+import codecs
+import csv
+import io
+import time
+
+import openpyxl
+
+from models.product import Product
+from services.export_service import COLUMN_DISPLAY_NAMES
+from utils.validator import ProductValidator
+
+from logging_config import get_logger
+logger = get_logger(__name__)
+
+# 可导入的列（计算列、图片与时间戳列忽略）
+IMPORTABLE_COLUMNS = {
+    'doc_date', 'customer_name', 'product_desc', 'unit', 'quantity', 'unit_price',
+    'unit_discount_rate', 'remark', 'freight', 'order_discount_rate', 'paid_total',
+    'settlement_account', 'description', 'salesperson'
+}
+# 每批校验与写入的行数
+IMPORT_CHUNK_SIZE = 500
+# 返回的错误明细上限，避免响应过大
+MAX_REPORTED_ERRORS = 500
+
+ALLOWED_IMPORT_EXTENSIONS = {'csv', 'xlsx', 'xlsm'}
+# 判断CSV编码时读取的字节数
+CSV_SNIFF_BYTES = 64 * 1024
+
+
+class ImportService:
+    """商品导入服务类"""
+
+    def __init__(self):
+        self.validator = ProductValidator()
+        # 表头 -> 列名：接受导出表头显示名，也接受内部列名
+        self.header_mapping = {}
+        for key, display in COLUMN_DISPLAY_NAMES.items():
+            if key in IMPORTABLE_COLUMNS:
+                self.header_mapping[display] = key
+                self.header_mapping[key] = key
+
+    def import_file(self, file, default_salesperson=None):
+        """导入上传的文件，返回逐行错误与吞吐统计"""
+        if not file or not file.filename:
+            return {'success': False, 'message': '没有选择文件'}
+        ext = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
+        if ext not in ALLOWED_IMPORT_EXTENSIONS:
+            return {'success': False, 'message': '不支持的文件格式，只支持CSV、XLSX'}
+
+        start = time.perf_counter()
+        rows = self._iter_csv(file.stream) if ext == 'csv' else self._iter_xlsx(file.stream)
+        try:
+            header = next(rows, None)
+        except Exception as e:
+            return {'success': False, 'message': f'文件读取失败: {str(e)}'}
+        if not header:
+            return {'success': False, 'message': '文件为空'}
+
+        columns = [self.header_mapping.get(str(h).strip()) if h is not None else None for h in header]
+        missing = [COLUMN_DISPLAY_NAMES[c] for c in ('doc_date', 'customer_name', 'product_desc', 'quantity')
+                   if c not in columns]
+        if missing:
+            return {'success': False, 'message': f"缺少必需列: {', '.join(missing)}"}
+
+        total_rows = 0
+        imported = 0
+        errors = []
+        chunk = []
+        try:
+            # 首行为表头，数据从第2行开始
+            for row_no, values in enumerate(rows, 2):
+                record = self._map_row(columns, values)
+                if record is None:
+                    continue
+                total_rows += 1
+                if default_salesperson and not record.get('salesperson'):
+                    record['salesperson'] = default_salesperson
+                chunk.append((row_no, record))
+                if len(chunk) >= IMPORT_CHUNK_SIZE:
+                    imported += self._flush(chunk, errors)
+                    chunk = []
+            if chunk:
+                imported += self._flush(chunk, errors)
+        except Exception as e:
+            logger.error(f'导入中断: {str(e)}')
+            errors.append({'row': None, 'message': f'导入中断: {str(e)}'})
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"导入完成: 共{total_rows}行, 成功{imported}行, 失败{len(errors)}行, 耗时{elapsed:.2f}s")
+        return {
+            'success': True,
+            'message': '导入完成',
+            'data': {
+                'total_rows': total_rows,
+                'imported': imported,
+                'fail_count': len(errors),
+                'errors': errors[:MAX_REPORTED_ERRORS],
+                'errors_truncated': len(errors) > MAX_REPORTED_ERRORS,
+                'elapsed_ms': round(elapsed * 1000, 1),
+                'rows_per_sec': round(total_rows / elapsed, 1) if elapsed > 0 else None
+            }
+        }
+
+    def _flush(self, chunk, errors):
+        """校验一批行并在一个事务中写入，返回成功条数"""
+        results = self.validator.validate_import_rows([record for _, record in chunk])
+        products = []
+        # 通过校验、参与写入的行号
+        saved_rows = []
+        for (row_no, record), result in zip(chunk, results):
+            if not result['valid']:
+                errors.append({'row': row_no, 'message': result['message']})
+                continue
+            products.append(self._to_product(record))
+            saved_rows.append(row_no)
+        try:
+            Product.bulk_insert(products)
+        except Exception as e:
+            # 整批回滚，参与写入的每行记为失败（校验失败的行已在上面记录）
+            for row_no in saved_rows:
+                errors.append({'row': row_no, 'message': f'保存失败: {str(e)}'})
+            return 0
+        return len(products)
+
+    def _map_row(self, columns, values):
+        """按表头映射为字段字典；整行为空返回 None"""
+        record = {}
+        for key, value in zip(columns, values):
+            if key is None:
+                continue
+            if isinstance(value, str):
+                value = value.strip()
+            elif isinstance(value, float) and value.is_integer():
+                # Excel 中的整数常以浮点读出
+                value = int(value)
+            if value in (None, ''):
+                continue
+            record[key] = value
+        return record or None
+
+    def _to_product(self, record):
+        def num(value):
+            return float(value) if value not in (None, '') else None
+
+        quantity = float(record['quantity'])
+        # 已通过校验，规范为 YYYY-MM-DD（日期范围筛选按字符串比较）
+        doc_date = self.validator.normalize_doc_date(record['doc_date'])
+        unit_price = num(record.get('unit_price')) or 0.0
+        return Product(
+            name=str(record['customer_name']),
+            price=unit_price,
+            quantity=int(quantity),
+            spec=record.get('unit'),
+            doc_date=doc_date,
+            customer_name=str(record['customer_name']),
+            product_desc=str(record['product_desc']),
+            unit=record.get('unit'),
+            unit_price=unit_price,
+            unit_discount_rate=num(record.get('unit_discount_rate')),
+            order_discount_rate=num(record.get('order_discount_rate')),
+            remark=record.get('remark'),
+            freight=num(record.get('freight')),
+            paid_total=num(record.get('paid_total')),
+            settlement_account=record.get('settlement_account'),
+            description=record.get('description'),
+            salesperson=record.get('salesperson')
+        )
+
+    def _detect_csv_encoding(self, stream):
+        """按文件开头判断编码：能按 UTF-8 解码（含BOM）则用 UTF-8，否则按 GB18030（中文版 Excel 另存的CSV）"""
+        head = stream.read(CSV_SNIFF_BYTES)
+        stream.seek(0)
+        try:
+            # 末尾可能截断多字节字符，按增量方式解码
+            codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+            return 'utf-8-sig'
+        except UnicodeDecodeError:
+            return 'gb18030'
+
+    def _iter_csv(self, stream):
+        """逐行读取CSV（UTF-8 兼容BOM；非 UTF-8 的按 GB18030 读取）"""
+        if not stream.seekable():
+            stream = io.BytesIO(stream.read())
+        encoding = self._detect_csv_encoding(stream)
+        text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+        try:
+            for row in csv.reader(text):
+                yield row
+        finally:
+            text.detach()
+
+    def _iter_xlsx(self, stream):
+        """以 read_only 模式逐行读取首个工作表"""
+        workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+        try:
+            worksheet = workbook.active
+            for row in worksheet.iter_rows(values_only=True):
+                yield row
+        finally:
+            workbook.close()
@@ -3,9 +3,18 @@
 商品业务服务层
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from models.archive import product_archive
 from models.product import Product
 from utils.file_handler import FileHandler
 from utils.validator import ProductValidator
+from services.thumbnail_service import thumbnail_service
+from services.purge_service import purge_service
+
+from logging_config import get_logger
+logger = get_logger(__name__)
 
 class ProductService:
     """商品业务服务类"""
@@ -14,6 +23,25 @@ class ProductService:
         self.file_handler = FileHandler()
         self.validator = ProductValidator()
     
+    def _upload_image(self, image_file):
+        """保存上传图片并提交缩略图后台任务"""
+        upload_result = self.file_handler.upload_image(image_file)
+        # 内容相同的图片已存在时不重复生成缩略图
+        if upload_result.get('success') and upload_result.get('created'):
+            thumbnail_service.submit(upload_result['filename'])
+        return upload_result
+
+    def _release_images(self, image_paths):
+        """释放已不被任何商品引用的图片文件（须在商品记录保存之后调用）
+
+        登记为延迟释放任务，由后台清理线程确认引用后删除，请求不等待文件删除；
+        未启用后台清理时退回同步释放。
+        """
+        if Config.PURGE_ENABLED:
+            purge_service.defer_release(image_paths)
+        else:
+            purge_service.release_images(image_paths)
+
     def add_product(self, name, price, quantity, spec, image_file, salesperson=None, doc_date=None, product_desc=None, remark=None, settlement_account=None, description=None, freight=None, paid_total=None):
         """添加商品"""
         # 录入必填校验（单据日期、客户名称、品名规格、数量）
@@ -28,11 +56,13 @@ class ProductService:
         
         # 处理图片上传
         image_path = None
+        image_meta = {}
         if image_file:
-            upload_result = self.file_handler.upload_image(image_file)
+            upload_result = self._upload_image(image_file)
             if not upload_result['success']:
                 return upload_result
             image_path = upload_result['filename']
+            image_meta = upload_result.get('meta') or {}
         
         # 创建商品对象
         product = Product(
@@ -43,13 +73,14 @@ class ProductService:
             image_path=image_path,
             # 新增字段入库（保持后端流程，未改原有SQL列集）
             salesperson=salesperson,
-            doc_date=doc_date,
+            doc_date=self.validator.normalize_doc_date(doc_date),
             product_desc=product_desc,
             remark=remark,
             settlement_account=settlement_account,
             description=description,
             freight=float(freight) if freight not in (None, '') else None,
-            paid_total=float(paid_total) if paid_total not in (None, '') else None
+            paid_total=float(paid_total) if paid_total not in (None, '') else None,
+            **image_meta
         )
         
         # 保存到数据库
@@ -92,32 +123,49 @@ class ProductService:
                 'message': f'查询失败: {str(e)}'
             }
     
+    def _missing_message(self, product_ids):
+        """修改、删除未命中主库时的提示：已归档的数据只读，其余为不存在"""
+        try:
+            if product_archive.archived_ids(product_ids):
+                return '归档数据只读，不能修改或删除'
+        except Exception as e:
+            logger.warning(f"查询归档数据失败: {str(e)}")
+        return '商品不存在'
+
     def delete_product(self, product_id):
-        """删除商品"""
+        """删除商品（软删除，图片与记录由后台任务到期清理）"""
+        return self.delete_products([product_id])
+
+    def delete_products(self, product_ids):
+        """批量删除商品（软删除）"""
         try:
-            product = Product.find_by_id(product_id)
-            if not product:
+            ids = [int(pid) for pid in product_ids]
+            count = Product.soft_delete(ids)
+            if not count:
                 return {
                     'success': False,
-                    'message': '商品不存在'
+                    'message': self._missing_message(ids)
                 }
-            
-            # 删除图片文件
-            if product.image_path:
-                self.file_handler.delete_image(product.image_path)
-            
-            # 删除数据库记录
-            product.delete()
-            
             return {
                 'success': True,
-                'message': '商品删除成功'
+                'message': '商品删除成功',
+                'deleted_count': count
             }
         except Exception as e:
             return {
                 'success': False,
                 'message': f'删除失败: {str(e)}'
             }
+
+    def restore_products(self, product_ids):
+        """撤销删除"""
+        try:
+            count = Product.restore([int(pid) for pid in product_ids])
+            if not count:
+                return {'success': False, 'message': '没有可恢复的商品（可能已被清理）'}
+            return {'success': True, 'message': '商品已恢复', 'restored_count': count}
+        except Exception as e:
+            return {'success': False, 'message': f'恢复失败: {str(e)}'}
     
     def update_product(self, product_id, name, price, quantity, spec, image_file,
                        product_desc=None, remark=None, settlement_account=None,
@@ -129,7 +177,7 @@ class ProductService:
             if not product:
                 return {
                     'success': False,
-                    'message': '商品不存在'
+                    'message': self._missing_message([product_id])
                 }
             
             # 数据验证
@@ -137,20 +185,16 @@ class ProductService:
             if not validation_result['valid']:
                 return validation_result
             
-            # 处理图片上传/删除
+            # 处理图片上传/删除；旧图片在保存后按引用释放
+            old_image_path = product.image_path
             if  delete_image and product.image_path:
-                self.file_handler.delete_image(product.image_path)
-                product.image_path = None
+                product.set_image(None)
             if image_file:
-                upload_result = self.file_handler.upload_image(image_file)
+                upload_result = self._upload_image(image_file)
                 if not upload_result['success']:
                     return upload_result
                 
-                # 删除旧图片
-                if product.image_path:
-                    self.file_handler.delete_image(product.image_path)
-                
-                product.image_path = upload_result['filename']
+                product.set_image(upload_result['filename'], upload_result.get('meta'))
             
             # 更新商品信息
             product.name = name
@@ -181,6 +225,8 @@ class ProductService:
             
             # 保存到数据库
             product.save()
+            if old_image_path and old_image_path != product.image_path:
+                self._release_images([old_image_path])
             
             return {
                 'success': True,
@@ -197,7 +243,6 @@ class ProductService:
         items: List[{'id': int, 'fields': dict}]
         仅允许更新白名单字段，忽略未知字段。
         """
-        from models.database import db_manager
         if not isinstance(items, list) or not items:
             return { 'success': False, 'message': '无有效更新项' }
 
@@ -211,39 +256,47 @@ class ProductService:
 
         success_count = 0
         fail_items = []
+        # 通过校验的条目：(序号, id, 字段)
+        updates = []
 
-        for item in items:
+        for idx, item in enumerate(items):
             try:
                 pid = int(item.get('id'))
                 fields = item.get('fields') or {}
                 if not pid or not isinstance(fields, dict) or not fields:
-                    fail_items.append({ 'id': item.get('id'), 'error': '参数无效' })
+                    fail_items.append((idx, { 'id': item.get('id'), 'error': '参数无效' }))
                     continue
 
                 # 过滤字段
                 update_fields = {k: v for k, v in fields.items() if k in allowed_fields}
                 if not update_fields:
-                    fail_items.append({ 'id': pid, 'error': '无可更新字段' })
+                    fail_items.append((idx, { 'id': pid, 'error': '无可更新字段' }))
                     continue
 
-                # 构造SQL
-                set_parts = []
-                params = []
-                for k, v in update_fields.items():
-                    set_parts.append(f"{k}=?")
-                    params.append(v)
-                # 自动更新 update_time
-                set_parts.append("update_time=datetime('now','+8 hours')")
-                sql = f"UPDATE products SET {', '.join(set_parts)} WHERE id=?"
-                params.append(pid)
+                updates.append((idx, pid, update_fields))
+            except Exception as e:
+                fail_items.append((idx, { 'id': item.get('id'), 'error': str(e) }))
 
-                affected = db_manager.execute_update(sql, tuple(params))
-                if affected > 0:
-                    success_count += 1
-                else:
-                    fail_items.append({ 'id': pid, 'error': '未找到或未更新' })
+        # 单事务批量写入，逐条回报结果
+        try:
+            errors = Product.batch_update_fields([(pid, fields) for _, pid, fields in updates])
+        except Exception as e:
+            errors = [str(e)] * len(updates)
+        missing = [pid for (_, pid, _), error in zip(updates, errors) if error == '未找到或未更新']
+        archived = set()
+        if missing:
+            try:
+                archived = product_archive.archived_ids(missing)
             except Exception as e:
-                fail_items.append({ 'id': item.get('id'), 'error': str(e) })
+                logger.warning(f"查询归档数据失败: {str(e)}")
+        for (idx, pid, _), error in zip(updates, errors):
+            if error is None:
+                success_count += 1
+            else:
+                if pid in archived:
+                    error = '归档数据只读，不能修改'
+                fail_items.append((idx, { 'id': pid, 'error': error }))
+        fail_items = [f for _, f in sorted(fail_items, key=lambda x: x[0])]
 
         return {
             'success': True,
@@ -255,33 +308,110 @@ class ProductService:
             }
         }
 
+    def batch_update_images(self, items):
+        """批量替换商品图片
+        items: List[(商品ID, 上传文件)]
+        图片在有界线程池中并行保存与规范化，全部图片路径在一个事务内写入；
+        写入后释放旧图并提交缩略图任务。
+        """
+        if not items:
+            return { 'success': False, 'message': '未提供图片' }
+        if len(items) > Config.BATCH_UPLOAD_MAX_FILES:
+            return { 'success': False, 'message': f'单次最多上传 {Config.BATCH_UPLOAD_MAX_FILES} 张图片' }
+
+        fail_items = []
+        # 通过校验的条目：(序号, id, 文件)
+        uploads = []
+        seen = set()
+        for idx, (product_id, image_file) in enumerate(items):
+            try:
+                pid = int(product_id)
+            except (TypeError, ValueError):
+                fail_items.append((idx, { 'id': product_id, 'error': '参数无效' }))
+                continue
+            if pid in seen:
+                fail_items.append((idx, { 'id': pid, 'error': '同一商品重复上传' }))
+                continue
+            seen.add(pid)
+            uploads.append((idx, pid, image_file))
+
+        # 保存与规范化（哈希、解码、重新编码）并行执行
+        workers = max(1, min(Config.BATCH_UPLOAD_WORKERS, len(uploads)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-upload') as executor:
+            results = list(executor.map(lambda u: self.file_handler.upload_image(u[2]), uploads))
+
+        updates = []
+        for (idx, pid, _), result in zip(uploads, results):
+            if result.get('success'):
+                updates.append((idx, pid, result))
+            else:
+                fail_items.append((idx, { 'id': pid, 'error': result.get('message') }))
+
+        # 单事务写入全部图片路径
+        try:
+            errors, old_paths = Product.batch_set_images(
+                [(pid, result['filename'], result.get('meta')) for _, pid, result in updates]
+            )
+        except Exception as e:
+            errors, old_paths = [str(e)] * len(updates), [None] * len(updates)
+
+        saved = []
+        released = []
+        for (idx, pid, result), error, old_path in zip(updates, errors, old_paths):
+            filename = result['filename']
+            if error is None:
+                saved.append({ 'id': pid, 'filename': filename, 'meta': result.get('meta') })
+                if old_path != filename:
+                    released.append(old_path)
+                if result.get('created'):
+                    thumbnail_service.submit(filename)
+            else:
+                fail_items.append((idx, { 'id': pid, 'error': error }))
+                # 未写入的新图片无人引用，随旧图一并释放
+                released.append(filename)
+        self._release_images(released)
+        fail_items = [f for _, f in sorted(fail_items, key=lambda x: x[0])]
+
+        return {
+            'success': True,
+            'message': '批量上传完成',
+            'data': {
+                'success_count': len(saved),
+                'fail_count': len(fail_items),
+                'items': saved,
+                'fails': fail_items
+            }
+        }
+
     def update_product_image(self, product_id, image_file=None, delete_image=False):
         """单独更新商品图片（支持替换或删除）"""
         try:
             product = Product.find_by_id(product_id)
             if not product:
-                return { 'success': False, 'message': '商品不存在' }
+                return { 'success': False, 'message': self._missing_message([product_id]) }
+
+            old_image_path = product.image_path
 
             # 删除图片
             if delete_image:
-                if product.image_path:
-                    self.file_handler.delete_image(product.image_path)
-                product.image_path = None
+                product.set_image(None)
                 product.save()
+                self._release_images([old_image_path])
                 return { 'success': True, 'message': '图片已删除' }
 
             # 替换图片
             if image_file:
-                upload_result = self.file_handler.upload_image(image_file)
+                upload_result = self._upload_image(image_file)
                 if not upload_result.get('success'):
                     return upload_result
                 new_filename = upload_result['filename']
-                # 删除旧图
-                if product.image_path:
-                    self.file_handler.delete_image(product.image_path)
-                product.image_path = new_filename
+                product.set_image(new_filename, upload_result.get('meta'))
                 product.save()
-                return { 'success': True, 'message': '图片更新成功', 'filename': new_filename }
+                # 旧图已无引用时释放
+                if old_image_path != new_filename:
+                    self._release_images([old_image_path])
+                return { 'success': True, 'message': '图片更新成功', 'filename': new_filename,
+                         'meta': upload_result.get('meta') }
 
             return { 'success': False, 'message': '未提供图片或删除标记' }
         except Exception as e:
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+后台清理服务：分批物理删除超过保留期的软删除数据，并释放不再被引用的图片文件
+
+多进程部署时每个 worker 都启动清理线程，但只有持有清理锁文件的进程执行清理（该进程退出后锁由其他进程接管）。
+"""
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows 只运行单进程开发服务器，无需选举
+    fcntl = None
+
+from config import Config
+from models.database import db_manager
+from models.image_task import ImageTask
+from models.product import Product
+from utils.file_handler import FileHandler
+
+from logging_config import get_logger
+logger = get_logger(__name__)
+
+
+class PurgeService:
+    """软删除数据清理服务类"""
+
+    def __init__(self, retention_hours=None, interval_seconds=None, batch_size=None):
+        self.retention_hours = Config.PURGE_RETENTION_HOURS if retention_hours is None else retention_hours
+        self.interval_seconds = Config.PURGE_INTERVAL_SECONDS if interval_seconds is None else interval_seconds
+        self.batch_size = Config.PURGE_BATCH_SIZE if batch_size is None else batch_size
+        self.file_handler = FileHandler()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # 清理锁文件句柄（持有即为执行清理的进程）
+        self._leader_file = None
+        self._leader_pid = None
+
+    def purge_once(self):
+        """清理到期数据直至没有剩余，返回删除的行数"""
+        total = 0
+        while True:
+            rows = Product.purge_deleted(self.retention_hours, self.batch_size)
+            # 行已提交删除后再释放文件，失败只会遗留文件，不会出现指向缺失文件的记录
+            self.release_images(r[1] for r in rows)
+            total += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        if total:
+            logger.info(f"已清理软删除数据 {total} 条")
+        self.release_deferred()
+        return total
+
+    def release_images(self, image_paths):
+        """释放已不被任何商品引用的图片（须在记录提交之后调用），返回释放的文件数
+
+        图片按内容共用，仍被引用的不删除；刚上传或去重命中的文件登记为延迟释放任务，
+        由后续清理轮次再次确认引用后删除。
+        """
+        released = 0
+        for image_path in Product.unreferenced_images(image_paths):
+            if self.file_handler.release_image(image_path):
+                released += 1
+            else:
+                ImageTask.enqueue(image_path, kind='release')
+        return released
+
+    def defer_release(self, image_paths):
+        """登记延迟释放（请求中调用）：文件删除与引用确认交给清理线程，不阻塞请求"""
+        ImageTask.enqueue_many(image_paths, kind='release')
+
+    def release_deferred(self):
+        """处理延迟释放任务：已重新被引用的直接完成，否则过了保护期再删除"""
+        pending = ImageTask.pending(kind='release')
+        if not pending:
+            return
+        unreferenced = set(Product.unreferenced_images(pending))
+        for image_path in pending:
+            if image_path not in unreferenced or self.file_handler.release_image(image_path):
+                ImageTask.mark_done(image_path, kind='release')
+
+    def _lock_path(self):
+        """清理锁文件：与数据库文件同目录"""
+        return f"{os.path.abspath(db_manager.config.get_database_path())}.purge.lock"
+
+    def is_leader(self):
+        """本进程是否负责执行清理：非阻塞地尝试获取清理锁，持有后一直保持到进程退出"""
+        if fcntl is None:
+            return True
+        pid = os.getpid()
+        if self._leader_file is not None and self._leader_pid == pid:
+            return True
+        # fork 前打开的句柄不代表子进程持锁（flock 随句柄继承，须各自重新获取）
+        self._leader_file = None
+        lock_file = open(self._lock_path(), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._leader_file = lock_file
+        self._leader_pid = pid
+        logger.info(f"进程 {pid} 负责执行后台清理")
+        return True
+
+    def start(self):
+        """启动后台线程（每个进程一个；fork 后在子进程中再次调用即可）"""
+        with self._lock:
+            pid = os.getpid()
+            if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+                return
+            self._stop.clear()
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='purge-service', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                if not self.is_leader():
+                    continue
+                self.purge_once()
+            except Exception as e:
+                logger.error(f"清理软删除数据失败: {str(e)}")
+
+
+# 全局清理服务实例
+purge_service = PurgeService()
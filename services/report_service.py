@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+汇总报表服务
+"""
+
+from models.product import Product, REPORT_DIMENSIONS
+from utils.cache import VersionedLRUCache
+
+from logging_config import get_logger
+logger = get_logger(__name__)
+
+# 报表结果缓存条数
+REPORT_CACHE_SIZE = 64
+# 单次最多组合的维度数
+MAX_GROUP_DIMENSIONS = 3
+
+
+class ReportService:
+    """汇总报表服务类：按筛选条件与数据版本缓存结果"""
+
+    def __init__(self):
+        self.cache = VersionedLRUCache(REPORT_CACHE_SIZE)
+
+    def get_report(self, group_by, filters):
+        """group_by: 逗号分隔或列表的维度；filters: 与 /product/list 相同的筛选条件"""
+        if isinstance(group_by, str):
+            group_by = [g.strip() for g in group_by.split(',') if g.strip()]
+        group_by = list(dict.fromkeys(group_by or []))
+        if not group_by:
+            return {'success': False, 'message': '请指定汇总维度'}
+        unknown = [g for g in group_by if g not in REPORT_DIMENSIONS]
+        if unknown:
+            return {'success': False, 'message': f"不支持的汇总维度: {', '.join(unknown)}"}
+        if len(group_by) > MAX_GROUP_DIMENSIONS:
+            return {'success': False, 'message': f'最多同时按{MAX_GROUP_DIMENSIONS}个维度汇总'}
+
+        filter_args = {
+            'search': filters.get('search') or None,
+            'product_desc': filters.get('product_desc') or None,
+            'salesperson': filters.get('salesperson') or None,
+            'date_start': filters.get('date_start') or None,
+            'date_end': filters.get('date_end') or None,
+        }
+        key = (tuple(group_by), tuple(sorted(filter_args.items())))
+        version = Product.data_version()
+        cached = self.cache.get(key, version)
+        if cached is not None:
+            return {'success': True, 'data': cached, 'cached': True}
+
+        try:
+            result = Product.aggregate(group_by, **filter_args)
+        except Exception as e:
+            logger.error(f'汇总查询失败: {str(e)}')
+            return {'success': False, 'message': f'汇总失败: {str(e)}'}
+        data = {'group_by': group_by, 'rows': result['rows'], 'totals': result['totals']}
+        self.cache.set(key, version, data)
+        return {'success': True, 'data': data, 'cached': False}
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图后台生成服务：上传请求只保存原图，缩略图与多尺寸衍生图交给线程池异步生成
+"""
+
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from models.image_task import ImageTask
+from utils.file_handler import FileHandler, THUMBNAIL_SIZE
+
+from logging_config import get_logger
+logger = get_logger(__name__)
+
+
+class ThumbnailService:
+    """缩略图生成服务类：任务先落库再入队，进程重启后未完成的任务重新执行
+
+    多进程部署时各进程都会入队同一批任务，处理前在库中原子认领（ImageTask.claim），同一任务只由一个进程生成；
+    认领超过 lease_seconds 仍未完成（进程已退出）的任务可被重新认领。
+    """
+
+    def __init__(self, workers=None, max_attempts=None, lease_seconds=None):
+        self.workers = Config.THUMBNAIL_WORKERS if workers is None else workers
+        self.max_attempts = Config.THUMBNAIL_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self.lease_seconds = Config.THUMBNAIL_TASK_LEASE if lease_seconds is None else lease_seconds
+        self.file_handler = FileHandler()
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # 本进程已入队未完成的文件，避免重复提交
+        self._inflight = set()
+
+    def _owner(self):
+        """认领者标识（主机名:进程号），fork 后各 worker 不同"""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _claim(self, filename):
+        return ImageTask.claim(filename, self._owner(), self.lease_seconds)
+
+    def _get_executor(self):
+        with self._lock:
+            pid = os.getpid()
+            if self._executor is None or self._pid != pid:
+                # fork 后父进程的线程不会随之复制，需重建线程池
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='thumbnail')
+                self._pid = pid
+                self._inflight = set()
+            return self._executor
+
+    def submit(self, filename):
+        """登记并提交缩略图任务（上传成功后调用）"""
+        if not filename:
+            return
+        try:
+            ImageTask.enqueue(filename)
+        except Exception as e:
+            # 任务记录失败不影响上传，缩略图访问时会回退到原图
+            logger.error(f"登记缩略图任务失败 {filename}: {str(e)}")
+        self._dispatch(filename)
+
+    def _dispatch(self, filename):
+        executor = self._get_executor()
+        with self._lock:
+            if filename in self._inflight:
+                return
+            self._inflight.add(filename)
+        executor.submit(self._run, filename)
+
+    def start(self):
+        """启动线程池并重新入队未完成的任务（每个进程调用一次）"""
+        self._get_executor()
+        try:
+            pending = ImageTask.pending(lease_seconds=self.lease_seconds)
+        except Exception as e:
+            logger.error(f"读取待处理缩略图任务失败: {str(e)}")
+            return 0
+        for filename in pending:
+            self._dispatch(filename)
+        if pending:
+            logger.info(f"重新入队缩略图任务 {len(pending)} 个")
+        return len(pending)
+
+    def generate(self, filename):
+        """同步生成缩略图与衍生图并标记任务完成"""
+        self.file_handler.create_variants(filename)
+        ImageTask.mark_done(filename)
+
+    def _run(self, filename):
+        try:
+            if not self._claim(filename):
+                # 其他进程已认领（或任务已完成），本进程不再处理
+                return
+            if not self.file_handler.file_exists(filename):
+                # 原图已被删除（如商品已清理），任务无需再执行
+                ImageTask.mark_failed(filename, '原图不存在', max_attempts=1)
+                return
+            self.file_handler.create_variants(filename)
+            ImageTask.mark_done(filename)
+        except Exception as e:
+            logger.error(f"生成缩略图失败 {filename}: {str(e)}")
+            try:
+                ImageTask.mark_failed(filename, e, self.max_attempts)
+            except Exception:
+                pass
+        finally:
+            with self._lock:
+                self._inflight.discard(filename)
+
+    def _record_failure(self, filename, error):
+        """记录现场生成失败，计入重试次数"""
+        try:
+            ImageTask.mark_failed(filename, error, self.max_attempts)
+        except Exception:
+            pass
+
+    def image_path(self, filename, width=None, accept_webp=False, thumbnail=False):
+        """选择要返回的图片文件，返回 (路径, 是否最终结果)；原图不存在返回 (None, False)
+
+        width: 请求的显示宽度，返回不小于该宽度的最小衍生图；accept_webp: 客户端是否接受 WebP；
+        thumbnail: 旧缩略图地址，未指定宽度时按缩略图尺寸选择。
+        衍生图尚未生成时按配置现场生成（须先认领任务），或先返回原图（非最终结果，不可长期缓存）；
+        任务已达重试上限（failed）时不再生成，原图即为最终结果。
+        """
+        if not self.file_handler.is_safe_name(filename):
+            return None, False
+        original_path = self.file_handler.get_image_path(filename)
+        if not os.path.isfile(original_path):
+            return None, False
+        if not width and not thumbnail:
+            return original_path, True
+        # thumb_ 在一次生成中最后写入，存在即表示衍生图已全部就绪
+        thumb_path = self.file_handler.get_thumb_path(filename)
+        if not os.path.isfile(thumb_path):
+            status = ImageTask.status(filename)
+            if status == ImageTask.FAILED:
+                # 无法解码等已多次失败的图片，不再每次访问都重试
+                return original_path, True
+            if status is None or status == ImageTask.DONE:
+                # 任务记录丢失（或已完成但文件被删除）时重新登记
+                ImageTask.enqueue(filename)
+            if not Config.THUMBNAIL_ON_DEMAND:
+                self._dispatch(filename)
+                return original_path, False
+            if not self._claim(filename):
+                # 其他进程正在生成，先返回原图
+                return original_path, False
+            try:
+                self.generate(filename)
+            except Exception as e:
+                logger.error(f"现场生成缩略图失败 {filename}: {str(e)}")
+                self._record_failure(filename, e)
+                return original_path, False
+        path = self.file_handler.select_variant(filename, width or THUMBNAIL_SIZE[0], accept_webp)
+        return path or original_path, True
+
+
+# 全局缩略图服务实例
+thumbnail_service = ThumbnailService()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+进程内缓存工具
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class VersionedLRUCache:
+    """带数据版本的 LRU 缓存：读取时版本不一致即视为失效
+
+    max_bytes 不为空时同时按总字节数（len(值)）限制，超出时淘汰最久未用的条目；单个值超过上限则不缓存。
+    """
+
+    def __init__(self, maxsize=128, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _size(self, value):
+        return len(value) if self.max_bytes is not None else 0
+
+    def _pop(self, key):
+        entry = self._data.pop(key)
+        self._bytes -= self._size(entry[1])
+
+    def get(self, key, version):
+        """命中返回缓存值，未命中或版本过期返回 None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] != version:
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, version, value):
+        """写入缓存，超出容量淘汰最久未用的条目"""
+        size = self._size(value)
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (version, value)
+            self._bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
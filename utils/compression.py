@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+响应压缩：按 Accept-Encoding 协商 gzip/br，JSON、HTML 等文本响应在返回前压缩，流式响应逐块压缩
+"""
+
+import functools
+import zlib
+
+from flask import request
+
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # 未安装 Brotli 时只提供 gzip
+    brotli = None
+
+# 需要压缩的响应类型（图片、xlsx 等本身已压缩）
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'text/javascript',
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'image/svg+xml',
+}
+
+
+def supported_encodings():
+    """服务端支持的编码，按优先级排列"""
+    return ['br', 'gzip'] if brotli else ['gzip']
+
+
+def negotiate_encoding(encodings=None):
+    """从给定编码中选出客户端接受且优先级最高的一个，都不接受时返回 None"""
+    encodings = supported_encodings() if encodings is None else encodings
+    if not encodings:
+        return None
+    return request.accept_encodings.best_match(encodings)
+
+
+def compress(data, encoding, level=None):
+    """一次性压缩整段数据；level 为空时使用动态响应的默认级别"""
+    if encoding == 'br':
+        quality = Config.COMPRESS_BROTLI_QUALITY if level is None else level
+        return brotli.compress(data, quality=quality)
+    compressor = zlib.compressobj(Config.COMPRESS_LEVEL if level is None else level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _compress_stream(chunks, encoding):
+    """逐块压缩并在每块后刷新，客户端可以边收边解压"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=Config.COMPRESS_BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(Config.COMPRESS_LEVEL, zlib.DEFLATED, 31)
+        process = compressor.compress
+        flush = functools.partial(compressor.flush, zlib.Z_SYNC_FLUSH)
+        finish = compressor.flush
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield process(chunk) + flush()
+        yield finish()
+    finally:
+        # 替换了原始可迭代对象，需自行关闭（如文件、生成器）
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response):
+    """after_request 钩子：对可压缩的文本响应按协商结果压缩"""
+    if (not Config.COMPRESS_ENABLED
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough  # send_file 发送的文件（静态资源由预压缩文件处理）
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < Config.COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+
+    # 压缩后字节不同，强 ETag 降为弱 ETag（条件请求按弱比较仍可命中）
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """为应用注册响应压缩"""
+    app.after_request(compress_response)
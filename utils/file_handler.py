@@ -3,17 +3,31 @@
 文件处理工具类
 """
 
+import hashlib
 import os
+import time
 import uuid
-from werkzeug.utils import secure_filename
-from PIL import Image
-from flask import current_app
+from PIL import Image, ImageOps
+
+from config import Config
+from utils.upload_index import upload_index
+
+# 缩略图最大边长
+THUMBNAIL_SIZE = (200, 200)
+# 衍生图编码格式 -> 扩展名
+VARIANT_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+# 上传流式写盘的块大小
+UPLOAD_CHUNK_SIZE = 256 * 1024
+# 入库时识别的图片格式 -> 扩展名
+INGEST_FORMATS = {'JPEG': 'jpg', 'PNG': 'png'}
+# 文件在此时间内被上传（或去重命中）过则暂不释放，避免与并发上传同一图片、尚未保存记录的请求竞争
+RELEASE_GRACE_SECONDS = 120
 
 class FileHandler:
     """文件处理类"""
     
-    def __init__(self, upload_folder='uploads'):
-        self.upload_folder = upload_folder
+    def __init__(self, upload_folder=None):
+        self.upload_folder = upload_folder or Config.UPLOAD_FOLDER
         self.allowed_extensions = {'png', 'jpg', 'jpeg'}
         os.makedirs(self.upload_folder, exist_ok=True)
     
@@ -37,28 +51,51 @@ class FileHandler:
                     'message': '不支持的文件格式，只支持PNG、JPG、JPEG'
                 }
             
-            # 生成唯一文件名
-            filename = secure_filename(file.filename)
-            file_ext = filename.rsplit('.', 1)[1].lower()
-            unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
-            file_path = os.path.join(self.upload_folder, unique_filename)
-            
-            # 保存原文件
-            file.save(file_path)
-            
-            # 创建缩略图
+
+            # 边写临时文件边计算内容哈希（不在内存中缓冲整个文件；规范化未改写文件时即为存储内容的哈希）
+            tmp_dir = os.path.join(self.upload_folder, '.tmp')
+            os.makedirs(tmp_dir, exist_ok=True)
+            tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+            hasher = hashlib.sha256()
             try:
-                with Image.open(file_path) as img:
-                    img.thumbnail((200, 200))
-                    thumb_path = os.path.join(self.upload_folder, f"thumb_{unique_filename}")
-                    img.save(thumb_path)
-            except Exception as e:
-                print(f"创建缩略图失败: {e}")
-                # 缩略图创建失败不影响主文件上传
+                size = 0
+                with open(tmp_path, 'wb') as out:
+                    for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                        # 单个文件大小上限（批量上传时逐个文件检查）
+                        size += len(chunk)
+                        if size > Config.MAX_CONTENT_LENGTH:
+                            raise ValueError('文件过大')
+                        hasher.update(chunk)
+                        out.write(chunk)
+
+                # 扩展名取实际格式（只读文件头）
+                file_ext = self._image_extension(tmp_path)
+
+                # 按存储内容（规范化之后）寻址的两级分片路径：ab/cd/<sha256>.<ext>
+                # 仅 EXIF/元数据不同的同一图片规范化后字节相同，只保存一份
+                if self._normalize_image(tmp_path):
+                    digest = self._file_digest(tmp_path)
+                else:
+                    digest = hasher.hexdigest()
+                stored_name = f"{digest[:2]}/{digest[2:4]}/{digest}.{file_ext}"
+                file_path = self.get_image_path(stored_name)
+                created = not os.path.exists(file_path)
+                if created:
+                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                    os.replace(tmp_path, file_path)
+                    upload_index.add(stored_name)
+                else:
+                    # 相同图片已存在：不重复保存，刷新修改时间以推迟释放
+                    os.utime(file_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
             
             return {
                 'success': True,
-                'filename': unique_filename,
+                'filename': stored_name,
+                'created': created,
+                'meta': self._image_meta(file_path, digest),
                 'message': '文件上传成功'
             }
             
@@ -68,38 +105,190 @@ class FileHandler:
                 'message': f'文件上传失败: {str(e)}'
             }
     
+    def _image_extension(self, path):
+        """按文件头识别图片格式，返回扩展名；不是支持的图片时抛出 ValueError"""
+        try:
+            with Image.open(path) as img:
+                fmt = img.format
+        except Exception:
+            raise ValueError('不是有效的图片文件')
+        if fmt not in INGEST_FORMATS:
+            raise ValueError('不支持的文件格式，只支持PNG、JPG、JPEG')
+        return INGEST_FORMATS[fmt]
+
+    def _file_digest(self, path):
+        """文件内容的 SHA-256（分块读取）"""
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def _image_meta(self, path, digest):
+        """入库文件的元数据（只读文件头），字段名与 products 表列一致；image_hash 为存储文件内容的 SHA-256"""
+        with Image.open(path) as img:
+            width, height = img.size
+            fmt = img.format
+        return {
+            'image_width': width,
+            'image_height': height,
+            'image_bytes': os.path.getsize(path),
+            'image_format': fmt,
+            'image_hash': digest,
+        }
+
+    def _normalize_image(self, path):
+        """入库规范化（原地替换）：按 EXIF 方向摆正、去除元数据、最长边不超过 IMAGE_MAX_EDGE
+
+        已摆正、无元数据且尺寸合规的图片保持原字节不重新编码。
+        """
+        max_edge = Config.IMAGE_MAX_EDGE
+        with Image.open(path) as img:
+            orientation = img.getexif().get(0x0112, 1)
+            has_metadata = any(key in img.info for key in ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop'))
+            oversized = max(img.size) > max_edge
+            if orientation == 1 and not has_metadata and not oversized:
+                return False
+
+            fmt = img.format
+            icc_profile = img.info.get('icc_profile')
+            if oversized:
+                # JPEG 按目标尺寸以 1/2、1/4、1/8 降采样解码，不完整解码大图
+                scale = max_edge / max(img.size)
+                img.draft(img.mode, (int(img.width * scale), int(img.height * scale)))
+            out = ImageOps.exif_transpose(img)
+            out.thumbnail((max_edge, max_edge))
+            # 保存时不带任何原始信息块（EXIF、XMP、注释等）
+            out.info = {}
+            params = {'format': fmt}
+            if icc_profile:
+                # 色彩配置不是元数据，保留以免颜色失真
+                params['icc_profile'] = icc_profile
+            if fmt == 'JPEG':
+                params.update(quality=Config.IMAGE_INGEST_QUALITY, optimize=True)
+            tmp_path = f"{path}.normalized"
+            try:
+                out.save(tmp_path, **params)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, path)
+        return True
+
+    def _save_atomic(self, img, path, **params):
+        """先写临时文件再原子替换，访问方不会读到写了一半的文件"""
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            img.save(tmp_path, **params)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def create_variants(self, filename):
+        """一次解码生成缩略图与全部衍生图：由大到小逐级缩放，每级都基于上一级结果"""
+        file_path = self.get_image_path(filename)
+        # (衍生图名称, 最大边长, 格式)；名称为 None 表示原格式缩略图 thumb_
+        targets = [(name, size, fmt) for name, (size, fmt) in Config.IMAGE_VARIANTS.items()]
+        targets.append((None, THUMBNAIL_SIZE[0], None))
+        targets.sort(key=lambda target: target[1], reverse=True)
+        with Image.open(file_path) as img:
+            original_format = img.format
+            # JPEG 按最大目标尺寸降采样解码，不完整解码大图
+            img.draft('RGB', (targets[0][1], targets[0][1]))
+            current = img.copy()
+        legacy_thumb = None
+        for name, size, fmt in targets:
+            current.thumbnail((size, size))
+            if name is None:
+                legacy_thumb = current.copy()
+                continue
+            out = current
+            if fmt == 'JPEG' and out.mode not in ('RGB', 'L'):
+                out = out.convert('RGB')
+            self._save_atomic(out, self.get_variant_path(filename, name),
+                              format=fmt, quality=Config.IMAGE_VARIANT_QUALITY)
+            upload_index.add(self.variant_name(filename, name))
+        # thumb_ 最后写入，作为全部衍生图已就绪的标志
+        self._save_atomic(legacy_thumb, self.get_thumb_path(filename), format=original_format)
+        upload_index.add(self.thumb_name(filename))
+        return True
+
+    def variant_name(self, filename, name):
+        """衍生图相对路径：<原文件名主干>.<名称>.<扩展名>"""
+        stem = filename.rsplit('.', 1)[0]
+        fmt = Config.IMAGE_VARIANTS[name][1]
+        return f"{stem}.{name}.{VARIANT_EXTENSIONS[fmt]}"
+
+    def get_variant_path(self, filename, name):
+        """衍生图完整路径"""
+        return self.get_image_path(self.variant_name(filename, name))
+
+    def select_variant(self, filename, width, accept_webp=False):
+        """选择边长不小于 width 的最小可用衍生图（含原格式缩略图 thumb_）；没有合适的返回 None（使用原图）"""
+        candidates = [(size, fmt, self.get_variant_path(filename, name))
+                      for name, (size, fmt) in Config.IMAGE_VARIANTS.items()]
+        candidates.append((THUMBNAIL_SIZE[0], None, self.get_thumb_path(filename)))
+        # 同尺寸时 WebP 优先（体积更小）
+        for size, fmt, path in sorted(candidates, key=lambda c: (c[0], c[1] != 'WEBP')):
+            if size < width or (fmt == 'WEBP' and not accept_webp):
+                continue
+            if os.path.isfile(path):
+                return path
+        return None
+
     def delete_image(self, filename):
         """删除图片文件"""
         try:
             if not filename:
                 return True
             
-            # 删除原图
-            file_path = os.path.join(self.upload_folder, filename)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
-            # 删除缩略图
-            thumb_path = os.path.join(self.upload_folder, f"thumb_{filename}")
-            if os.path.exists(thumb_path):
-                os.remove(thumb_path)
+            # 删除原图、缩略图与衍生图
+            names = [filename, self.thumb_name(filename)]
+            names.extend(self.variant_name(filename, name) for name in Config.IMAGE_VARIANTS)
+            for name in names:
+                path = self.get_image_path(name)
+                if os.path.exists(path):
+                    os.remove(path)
+                upload_index.discard(name)
             
             return True
         except Exception as e:
             print(f"删除文件失败: {e}")
             return False
     
+    def release_image(self, filename):
+        """释放已无引用的图片；近期刚上传或去重命中的文件暂不删除，返回 False"""
+        try:
+            if time.time() - os.path.getmtime(self.get_image_path(filename)) < RELEASE_GRACE_SECONDS:
+                return False
+        except OSError:
+            pass
+        return self.delete_image(filename)
+
     def get_image_path(self, filename):
-        """获取图片完整路径"""
-        return os.path.join(self.upload_folder, filename)
+        """获取图片完整路径（filename 为 uploads 下的相对路径，可含分片目录）"""
+        return os.path.join(self.upload_folder, *filename.split('/'))
     
+    def thumb_name(self, filename):
+        """缩略图相对路径：与原图同目录的 thumb_ 文件"""
+        directory, _, name = filename.rpartition('/')
+        return f"{directory}/thumb_{name}" if directory else f"thumb_{name}"
+
     def get_thumb_path(self, filename):
         """获取缩略图完整路径"""
-        return os.path.join(self.upload_folder, f"thumb_{filename}")
+        return self.get_image_path(self.thumb_name(filename))
+
+    def is_safe_name(self, filename):
+        """URL 中传入的图片名是否合法（不含上级目录或隐藏路径）"""
+        if not filename or '\\' in filename:
+            return False
+        return all(part and not part.startswith('.') for part in filename.split('/'))
     
     def file_exists(self, filename):
         """检查文件是否存在"""
         if not filename:
             return False
-        file_path = os.path.join(self.upload_folder, filename)
-        return os.path.exists(file_path)
+        return os.path.exists(self.get_image_path(filename))
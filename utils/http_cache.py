@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP 条件请求工具：强 ETag 生成与 If-None-Match 判断
+"""
+
+import hashlib
+import json
+
+from flask import request, Response
+
+# 动态数据的默认缓存策略：浏览器可缓存，但每次使用前必须带 ETag 回源验证
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(*parts):
+    """由数据版本号与请求参数等计算强 ETag（不含引号，由 set_etag 负责加引号）"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def not_modified(etag, cache_control=REVALIDATE_CACHE_CONTROL):
+    """客户端 If-None-Match 命中时返回 304 响应，否则返回 None
+
+    按弱比较判断：压缩后的响应 ETag 会被标记为弱 ETag，客户端回传的 W/"..." 同样视为命中。
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    return with_etag(response, etag, cache_control)
+
+
+def with_etag(response, etag, cache_control=REVALIDATE_CACHE_CONTROL):
+    """为响应设置强 ETag 与缓存策略"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
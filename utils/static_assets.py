@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+静态资源：启动时生成带内容哈希的文件副本与 .gz/.br 预压缩文件；
+页面通过 asset_url 引用哈希地址（内容不变，可长期缓存），请求时按 Accept-Encoding 直接发送预压缩文件
+"""
+
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import uuid
+
+from flask import abort, current_app, send_file, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+from config import Config
+from utils.compression import compress, negotiate_encoding, supported_encodings
+
+from logging_config import get_logger
+logger = get_logger(__name__)
+
+# 需要预压缩的文本资源（字体、图片本身已压缩）
+PRECOMPRESS_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.map', '.txt', '.html'}
+# 编码 -> 预压缩文件后缀
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+# 预压缩使用最高压缩级别（只在启动时执行一次）
+PRECOMPRESS_LEVELS = {'br': 11, 'gzip': 9}
+# 带哈希的文件副本目录（static 下）
+DIST_DIR = 'dist'
+# 文件名中内容哈希的长度
+FINGERPRINT_LENGTH = 12
+# CSS 中的 url(...) 引用
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def _compressible(path):
+    return os.path.splitext(path)[1].lower() in PRECOMPRESS_EXTENSIONS
+
+
+def _fresh(source, target):
+    """预压缩文件存在且不早于源文件"""
+    try:
+        return os.path.getmtime(target) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_path, 'wb') as out:
+            out.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class StaticManifest:
+    """静态资源清单：原相对路径 -> 带内容哈希的副本路径（位于 static/dist 下）"""
+
+    def __init__(self):
+        self.assets = {}
+
+    def build(self, folder):
+        """为 folder 下的资源生成哈希副本，清理过期副本，返回清单条目数
+
+        CSS 中引用的相对地址（如字体）改写为对应的哈希地址，CSS 的哈希按改写后的内容计算。
+        """
+        dist_root = os.path.join(folder, DIST_DIR)
+        sources = []
+        for root, dirs, files in os.walk(folder):
+            if root == folder and DIST_DIR in dirs:
+                dirs.remove(DIST_DIR)
+            for name in files:
+                if name.endswith(tuple(ENCODING_SUFFIXES.values())) or name.endswith('.tmp'):
+                    continue
+                sources.append(os.path.relpath(os.path.join(root, name), folder).replace(os.sep, '/'))
+        # CSS 最后处理，其引用的文件此时已有哈希地址
+        sources.sort(key=lambda rel: rel.endswith('.css'))
+
+        assets = {}
+        for rel in sources:
+            with open(os.path.join(folder, *rel.split('/')), 'rb') as f:
+                data = f.read()
+            if rel.endswith('.css'):
+                data = self._rewrite_css(rel, data, assets)
+            digest = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]
+            stem, ext = posixpath.splitext(rel)
+            hashed = f"{DIST_DIR}/{stem}.{digest}{ext}"
+            target = os.path.join(folder, *hashed.split('/'))
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                _write_atomic(target, data)
+            assets[rel] = hashed
+
+        # 删除不再使用的旧副本（含其预压缩文件）
+        current = {os.path.join(folder, *hashed.split('/')) for hashed in assets.values()}
+        for root, _, files in os.walk(dist_root):
+            for name in files:
+                path = os.path.join(root, name)
+                source = path
+                for suffix in ENCODING_SUFFIXES.values():
+                    if name.endswith(suffix):
+                        source = path[:-len(suffix)]
+                if source not in current:
+                    os.remove(path)
+        self.assets = assets
+        return len(assets)
+
+    def _rewrite_css(self, rel, data, assets):
+        """把 CSS 中指向 static 内文件的相对地址改写为哈希副本的相对地址"""
+        base = posixpath.dirname(rel)
+        hashed_base = posixpath.dirname(f"{DIST_DIR}/{rel}")
+
+        def replace(match):
+            quote, url = match.group(1), match.group(2).strip()
+            if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+                return match.group(0)
+            # 原地址上的版本参数由文件名哈希取代
+            path, _, fragment = url.partition('#')
+            path = path.split('?', 1)[0]
+            hashed = assets.get(posixpath.normpath(posixpath.join(base, path)))
+            if not hashed:
+                return match.group(0)
+            new_url = posixpath.relpath(hashed, hashed_base) + (f"#{fragment}" if fragment else '')
+            return f"url({quote}{new_url}{quote})"
+
+        return CSS_URL_RE.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+    def url(self, path):
+        """模板中引用静态资源：有哈希副本时返回其地址，否则返回原地址"""
+        return url_for('static', filename=self.assets.get(path, path))
+
+    def is_fingerprinted(self, filename):
+        return filename.startswith(f"{DIST_DIR}/")
+
+
+# 全局静态资源清单
+static_manifest = StaticManifest()
+
+
+def precompress_static(folder):
+    """为目录下的文本资源生成预压缩文件（已是最新的跳过），返回生成的文件数"""
+    created = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            if not _compressible(path) or os.path.getsize(path) < Config.COMPRESS_MIN_SIZE:
+                continue
+            data = None
+            for encoding in supported_encodings():
+                target = path + ENCODING_SUFFIXES[encoding]
+                if _fresh(path, target):
+                    continue
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                _write_atomic(target, compress(data, encoding, level=PRECOMPRESS_LEVELS[encoding]))
+                created += 1
+    return created
+
+
+def send_static(filename):
+    """静态资源访问：客户端接受且存在最新的预压缩文件时直接发送该文件；哈希副本可长期缓存"""
+    folder = current_app.static_folder
+    path = safe_join(folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    # 哈希副本内容不会变化，浏览器在有效期内无需回源
+    fingerprinted = static_manifest.is_fingerprinted(filename)
+    max_age = Config.STATIC_CACHE_MAX_AGE if fingerprinted else current_app.get_send_file_max_age(filename)
+
+    encoding = None
+    if _compressible(path):
+        available = [e for e in supported_encodings() if _fresh(path, path + ENCODING_SUFFIXES[e])]
+        encoding = negotiate_encoding(available)
+    if encoding:
+        # ETag 由预压缩文件自身计算，与未压缩版本不同
+        response = send_file(path + ENCODING_SUFFIXES[encoding],
+                             mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                             conditional=True, max_age=max_age)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(folder, filename, max_age=max_age)
+    if _compressible(path):
+        response.vary.add('Accept-Encoding')
+    if fingerprinted:
+        response.cache_control.immutable = True
+    return response
+
+
+def init_static(app):
+    """生成哈希副本与预压缩文件，注册 asset_url 模板函数并接管 static 路由"""
+    folder = app.static_folder
+    if folder and os.path.isdir(folder):
+        if Config.STATIC_FINGERPRINT:
+            try:
+                count = static_manifest.build(folder)
+                logger.info(f"静态资源清单生成完成，共 {count} 个文件")
+            except Exception as e:
+                # 目录不可写等情况下页面使用原地址
+                logger.warning(f"静态资源清单生成失败: {str(e)}")
+        if Config.STATIC_PRECOMPRESS:
+            try:
+                created = precompress_static(folder)
+                if created:
+                    logger.info(f"静态资源预压缩完成，生成 {created} 个文件")
+            except Exception as e:
+                # 目录不可写等情况下退回未压缩发送
+                logger.warning(f"静态资源预压缩失败: {str(e)}")
+    app.jinja_env.globals['asset_url'] = static_manifest.url
+    app.view_functions['static'] = send_static
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+上传目录文件索引：进程内记录 uploads 下已存在的文件，导出等批量场景按名查找无需逐个 stat
+"""
+
+import os
+import threading
+import time
+
+from config import Config
+
+# 不纳入索引的目录（上传临时文件）
+_SKIP_DIRS = {'.tmp'}
+
+
+class UploadIndex:
+    """按目录 mtime 校验的文件索引：目录未变化则沿用上次的文件列表"""
+
+    def __init__(self, root, ttl=None):
+        self.root = root
+        # 两次目录校验的最小间隔（秒）；本进程的写入/删除会即时更新索引，不受此限制
+        self.ttl = Config.UPLOAD_INDEX_TTL if ttl is None else ttl
+        # 相对目录（'' 为根目录，分隔符统一为 /） -> (mtime, 文件名集合, 子目录列表)
+        self._dirs = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """按目录 mtime 增量刷新；距上次校验不足 ttl 秒时跳过"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._checked_at is not None and now - self._checked_at < self.ttl:
+                return
+            self._refresh_dir('')
+            self._checked_at = now
+
+    def _refresh_dir(self, rel_dir):
+        entry = self._check_dir(rel_dir)
+        if entry is None:
+            return
+        # 新文件只改变其所在目录的 mtime，子目录需逐个校验
+        for name in entry[2]:
+            self._refresh_dir(f"{rel_dir}/{name}" if rel_dir else name)
+
+    def _check_dir(self, rel_dir):
+        """校验单个目录（不递归）：mtime 变化时重新列出，目录不存在时移除并返回 None"""
+        abs_dir = os.path.join(self.root, *filter(None, rel_dir.split('/')))
+        try:
+            mtime = os.stat(abs_dir).st_mtime_ns
+        except FileNotFoundError:
+            self._drop(rel_dir)
+            return None
+        entry = self._dirs.get(rel_dir)
+        if entry is None or entry[0] != mtime:
+            files, subdirs = set(), []
+            with os.scandir(abs_dir) as it:
+                for item in it:
+                    if item.is_dir(follow_symlinks=False):
+                        if item.name not in _SKIP_DIRS:
+                            subdirs.append(item.name)
+                    else:
+                        files.add(item.name)
+            # 子目录被删除时一并移除其索引
+            for old in (entry[2] if entry else ()):
+                if old not in subdirs:
+                    self._drop(f"{rel_dir}/{old}" if rel_dir else old)
+            if entry is None and rel_dir:
+                # 首次见到的分片目录挂到上级目录下，整体刷新时一并校验
+                self._ensure_dir(rel_dir)
+            entry = (mtime, frozenset(files), subdirs)
+            self._dirs[rel_dir] = entry
+        return entry
+
+    def _drop(self, rel_dir):
+        prefix = rel_dir + '/'
+        for key in [k for k in self._dirs if k == rel_dir or k.startswith(prefix)]:
+            del self._dirs[key]
+
+    def _split(self, name):
+        rel_dir, _, filename = name.replace('\\', '/').rpartition('/')
+        return rel_dir, filename
+
+    def contains(self, name):
+        """文件是否存在（name 为 uploads 下的相对路径），只查内存"""
+        if self._checked_at is None:
+            self.refresh()
+        rel_dir, filename = self._split(name)
+        entry = self._dirs.get(rel_dir)
+        return entry is not None and filename in entry[1]
+
+    def resolve(self, name, recheck=False):
+        """存在时返回绝对路径，否则返回空字符串
+
+        recheck=True 时索引未命中会校验该文件所在的分片目录（一次 stat，目录有变化才重新列出），
+        其他进程刚写入、尚未到 ttl 的文件也能找到。
+        """
+        if not name:
+            return ''
+        if not self.contains(name):
+            if not recheck:
+                return ''
+            rel_dir, filename = self._split(name)
+            with self._lock:
+                entry = self._check_dir(rel_dir)
+            if entry is None or filename not in entry[1]:
+                return ''
+        return os.path.join(self.root, *name.replace('\\', '/').split('/'))
+
+    def _update(self, name, present):
+        """本进程写入/删除文件后即时更新；目录 mtime 保持旧值，下次校验时仍会重新列出该目录"""
+        if self._checked_at is None:
+            return
+        rel_dir, filename = self._split(name)
+        with self._lock:
+            self._ensure_dir(rel_dir)
+            mtime, files, subdirs = self._dirs[rel_dir]
+            files = set(files)
+            if present:
+                files.add(filename)
+            else:
+                files.discard(filename)
+            self._dirs[rel_dir] = (mtime, frozenset(files), subdirs)
+
+    def _ensure_dir(self, rel_dir):
+        """新建的分片目录先登记为待校验，挂到上级目录下"""
+        if rel_dir in self._dirs:
+            return
+        if not rel_dir:
+            self._dirs[''] = (None, frozenset(), [])
+            return
+        parent, _, name = rel_dir.rpartition('/')
+        self._ensure_dir(parent)
+        if name not in self._dirs[parent][2]:
+            self._dirs[parent][2].append(name)
+        self._dirs[rel_dir] = (None, frozenset(), [])
+
+    def add(self, name):
+        self._update(name, True)
+
+    def discard(self, name):
+        self._update(name, False)
+
+
+# 全局上传文件索引
+upload_index = UploadIndex(Config.UPLOAD_FOLDER)
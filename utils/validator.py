@@ -3,14 +3,35 @@
 数据验证工具类
 """
 
+from datetime import date, datetime
+
+# 接受的单据日期格式（Excel 另存的 CSV 常用 / 分隔）
+DOC_DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d')
+
+
 class ProductValidator:
     """商品数据验证类"""
-    
+
+    @staticmethod
+    def normalize_doc_date(value):
+        """单据日期规范为 YYYY-MM-DD；格式无效返回 None（日期对象与带时间的字符串取日期部分）"""
+        if isinstance(value, (datetime, date)):
+            return value.strftime('%Y-%m-%d')
+        text = str(value).strip().split(' ', 1)[0]
+        for fmt in DOC_DATE_FORMATS:
+            try:
+                return datetime.strptime(text, fmt).strftime('%Y-%m-%d')
+            except ValueError:
+                continue
+        return None
+
     @staticmethod
     def validate_entry_required(doc_date, name, product_desc, quantity):
-        """录入必填校验：单据日期、客户名称、品名规格、数量"""
+        """录入必填校验：单据日期（须为有效日期）、客户名称、品名规格、数量"""
         if not doc_date or not str(doc_date).strip():
             return { 'valid': False, 'message': '单据日期不能为空' }
+        if ProductValidator.normalize_doc_date(doc_date) is None:
+            return { 'valid': False, 'message': f'单据日期格式无效: {doc_date}（应为 YYYY-MM-DD）' }
         if not name or not str(name).strip():
             return { 'valid': False, 'message': '客户名称不能为空' }
         if not product_desc or not str(product_desc).strip():
@@ -49,7 +70,7 @@ class ProductValidator:
                     'valid': False,
                     'message': '价格必须大于等于0'
                 }
-        except ValueError:
+        except (TypeError, ValueError):
             return {
                 'valid': False,
                 'message': '价格必须是有效数字'
@@ -63,7 +84,7 @@ class ProductValidator:
                     'valid': False,
                     'message': '数量必须大于等于0'
                 }
-        except ValueError:
+        except (TypeError, ValueError):
             return {
                 'valid': False,
                 'message': '数量必须是有效整数'
@@ -81,6 +102,32 @@ class ProductValidator:
             'message': '数据验证通过'
         }
     
+    @staticmethod
+    def validate_import_rows(rows):
+        """批量校验导入行（字段名与 products 列一致），返回与 rows 对齐的校验结果"""
+        results = []
+        for row in rows:
+            result = ProductValidator.validate_entry_required(
+                row.get('doc_date'), row.get('customer_name'), row.get('product_desc'), row.get('quantity')
+            )
+            if result['valid']:
+                result = ProductValidator.validate_product_data(
+                    str(row.get('customer_name')), row.get('unit_price', 0), str(row.get('quantity'))
+                )
+            if result['valid']:
+                for key, label in (('freight', '运费'), ('paid_total', '已收款'),
+                                   ('unit_discount_rate', '单价折扣率'), ('order_discount_rate', '整单折扣率')):
+                    value = row.get(key)
+                    if value in (None, ''):
+                        continue
+                    try:
+                        float(value)
+                    except (TypeError, ValueError):
+                        result = {'valid': False, 'message': f'{label}必须是有效数字'}
+                        break
+            results.append(result)
+        return results
+
     @staticmethod
     def validate_search_params(page, per_page):
         """验证搜索参数"""
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生产环境 WSGI 入口：gunicorn -c gunicorn.conf.py wsgi:application
+
+导入时创建应用并完成数据库初始化；配合 preload_app 只在主进程执行一次，
+后台线程由 gunicorn.conf.py 的 post_fork 在每个 worker 中启动。
+"""
+
+from app_mvc import app
+
+application = app